@@ -4,80 +4,122 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from utils.compression import CompressionMiddleware
 
 class Base(DeclarativeBase):
     pass
 
 db = SQLAlchemy(model_class=Base)
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "casino_secret_key_2025")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-database_url = os.environ.get("DATABASE_URL", "sqlite:///casino.db")
-
-# MySQL configuration for shared hosting
-if database_url.startswith('mysql'):
-    # Use PyMySQL as the driver for MySQL
-    if 'pymysql' not in database_url:
-        database_url = database_url.replace('mysql://', 'mysql+pymysql://')
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-        "pool_timeout": 20,
-        "pool_size": 10,
-        "max_overflow": 0
-    }
-else:
-    # PostgreSQL or SQLite configuration
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
-
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["UPLOAD_FOLDER"] = "uploads"
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
-
-# Initialize the app with the extension
-db.init_app(app)
-
-# Create upload directory if it doesn't exist
-os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-
-with app.app_context():
+def create_app(config=None):
+    """Build the Flask app.
+
+    Only cheap, per-process setup happens here so workers boot fast. Tables,
+    migrations, the upload folder and the default admin are set up once per
+    deploy by `flask --app main bootstrap`.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "casino_secret_key_2025")
+
+    # Configure the database
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///casino.db")
+
+    # MySQL configuration for shared hosting
+    if database_url.startswith('mysql'):
+        # Use PyMySQL as the driver for MySQL
+        if 'pymysql' not in database_url:
+            database_url = database_url.replace('mysql://', 'mysql+pymysql://')
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_recycle": 300,
+            "pool_pre_ping": True,
+            "pool_timeout": 20,
+            "pool_size": 10,
+            "max_overflow": 0
+        }
+    else:
+        # PostgreSQL or SQLite configuration
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_recycle": 300,
+            "pool_pre_ping": True,
+        }
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL", "INFO").upper()
+    app.config["UPLOAD_FOLDER"] = "uploads"
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+    # Let nginx ('nginx', X-Accel-Redirect) or Apache/lighttpd ('sendfile', X-Sendfile) send uploads, see routes/uploads.py
+    app.config["UPLOADS_OFFLOAD"] = os.environ.get("UPLOADS_OFFLOAD") or None
+    app.config["UPLOADS_ACCEL_PREFIX"] = os.environ.get("UPLOADS_ACCEL_PREFIX", "/_uploads/")
+    # `flask bootstrap` / `flask assets build` build static/dist at deploy time and workers only
+    # load its manifest; set to 1 for a dev server without a deploy step
+    app.config["ASSETS_BUILD_ON_STARTUP"] = os.environ.get("ASSETS_BUILD_ON_STARTUP", "0") == "1"
+
+    # Password hashing runs in a per-worker process pool, see utils/passwords.py
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_MAX_QUEUE"] = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 8))
+
+    # /metrics is open to admins and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    # Shared by every worker on the host, see utils/metrics.py
+    app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR")
+    # Slow-query log and N+1 detector, see utils/sql_diagnostics.py
+    app.config["SQL_DIAGNOSTICS"] = os.environ.get("SQL_DIAGNOSTICS", "0") == "1"
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 100))
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+
+    if config:
+        app.config.update(config)
+
+    # Set up logging
+    logging.basicConfig(level=app.config["LOG_LEVEL"])
+    logging.getLogger().setLevel(app.config["LOG_LEVEL"])
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    # gzip/brotli for HTML and JSON responses, see utils/compression.py
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                         level=int(os.environ.get("COMPRESSION_LEVEL", 6)),
+                                         brotli_quality=int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4)),
+                                         min_size=int(os.environ.get("COMPRESSION_MIN_SIZE", 1024)))
+
+    # Initialize the app with the extension
+    db.init_app(app)
+
     # Import models and routes
     import models
-    from routes import auth, user, admin, main
-    
+    from routes import auth, user, admin, main, uploads, assets, metrics
+
     # Register blueprints
     app.register_blueprint(auth.bp)
     app.register_blueprint(user.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(main.bp)
-    
-    # Create all tables
-    db.create_all()
-    
-    # Create default admin user
-    from models import Admin
-    from werkzeug.security import generate_password_hash
-    
-    admin_user = Admin.query.filter_by(username='admin').first()
-    if not admin_user:
-        admin_user = Admin(
-            username='admin',
-            password_hash=generate_password_hash('admin'),
-            role='super_admin'
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-        print("Default admin user created (admin/admin)")
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.register_blueprint(uploads.bp)
+    app.register_blueprint(assets.bp)
+    app.register_blueprint(metrics.bp)
+
+    # Latency, SQL and response size per endpoint
+    from utils import metrics as request_metrics
+    request_metrics.init_app(app)
+    from utils import sql_diagnostics
+    sql_diagnostics.init_app(app)
+
+    # Fingerprinted static files, see utils/assets.py
+    from utils import assets as static_assets
+    static_assets.init_app(app)
+
+    # Navbar identity, see utils/helpers.py
+    from utils.helpers import get_identity
+    app.jinja_env.globals['current_identity'] = get_identity
+
+    # Register CLI commands
+    import commands
+    app.cli.add_command(commands.bootstrap)
+    app.cli.add_command(commands.stats_cli)
+    app.cli.add_command(commands.db_cli)
+    app.cli.add_command(commands.users_cli)
+    app.cli.add_command(commands.storage_cli)
+    app.cli.add_command(commands.assets_cli)
+    app.cli.add_command(commands.export)
+
+    return app
@@ -0,0 +1,65 @@
+"""Worker boot time: how long a fresh process takes to import and build the app.
+
+Each run starts a new interpreter (like a gunicorn worker after a reload) and
+times three stages: importing app.py, create_app(), and serving the first
+request. Exits 1 when the median boot time is above --target-ms, so it can
+gate a deploy.
+
+    python benchmarks/bench_boot.py --runs 10 --target-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/auth/login')
+served = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - started}}))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=1500, help='fail if the median total is above this')
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    options = parser.parse_args()
+
+    environ = dict(os.environ, LOG_LEVEL='WARNING')
+    environ['DATABASE_URL'] = options.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'boot.db')}"
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'bootstrap'],
+                   cwd=ROOT, env=environ, check=True, capture_output=True)
+
+    samples = []
+    for _ in range(options.runs):
+        output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT)], cwd=ROOT, env=environ,
+                                check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'stage':<14} {'median ms':>10} {'max ms':>8}")
+    for stage in ('import', 'create_app', 'first_request', 'total'):
+        values = [sample[stage] * 1000 for sample in samples]
+        print(f"{stage:<14} {statistics.median(values):>10.1f} {max(values):>8.1f}")
+
+    median_total = statistics.median(sample['total'] * 1000 for sample in samples)
+    if median_total > options.target_ms:
+        print(f"Median boot {median_total:.0f} ms is above the {options.target_ms:.0f} ms target")
+        sys.exit(1)
+    print(f"Median boot {median_total:.0f} ms is within the {options.target_ms:.0f} ms target")
+
+if __name__ == '__main__':
+    main()
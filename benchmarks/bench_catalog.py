@@ -0,0 +1,133 @@
+"""Games catalog search latency: in-memory index vs the equivalent SQL.
+
+Seeds --games games (see seed.py), then times a mix of catalog queries (plain
+listing, category filter, full-word and prefix search, deep pages) against
+utils.catalog and against the ILIKE/ORDER BY/LIMIT/OFFSET query that would
+answer the same request, checking both return the same page. Also times the
+full index build, an incremental add and the /games and /games/search.json
+endpoints. Exits 1 when the index's p95 exceeds --max-p95-ms.
+
+    python benchmarks/bench_catalog.py --games 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERIES = (
+    # (q, category, sort, page)
+    ('', None, 'newest', 1),
+    ('', 'slots', 'title', 1),
+    ('', None, 'min_bet', 40),
+    ('dragon', None, 'newest', 1),
+    ('dra', None, 'title', 1),
+    ('golden jack', None, 'newest', 1),
+    ('g', None, 'newest', 1),
+    ('royal', 'live', 'min_bet', 2),
+    ('lott', None, 'newest', 3),
+    ('zzz', None, 'newest', 1),
+)
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda fraction: samples[min(len(samples) - 1, int(len(samples) * fraction))]
+    return statistics.median(samples), pick(0.95), pick(0.99)
+
+def sql_search(q, category, sort, page, per_page):
+    """The same page straight from the database, as [id]"""
+    from sqlalchemy import or_
+    from models import Game
+    from utils.catalog import tokenize
+    query = Game.query.filter_by(is_active=True)
+    if category:
+        query = query.filter(Game.category == category)
+    for term in tokenize(q):
+        # Word-prefix match, like the index: at the start or after a space
+        query = query.filter(or_(Game.title.ilike(f'{term}%'), Game.title.ilike(f'% {term}%'),
+                                 Game.category.ilike(f'{term}%')))
+    ordering = {'newest': (Game.created_at.desc(), Game.id.desc()), 'oldest': (Game.created_at, Game.id),
+                'title': (Game.title, Game.id), 'min_bet': (Game.min_bet, Game.id)}[sort]
+    return [game.id for game in query.order_by(*ordering).limit(per_page).offset((page - 1) * per_page)]
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='an already seeded database; defaults to a fresh temporary SQLite file')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=24)
+    parser.add_argument('--max-p95-ms', type=float, default=5.0)
+    options = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = options.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'catalog.db')}"
+    from app import create_app, db
+    from models import Game
+    from utils.catalog import Catalog
+    from utils.migrations import bootstrap
+    from seed import seed
+
+    app = create_app({'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        bootstrap()
+        if options.database_url is None:
+            seed(db, users=100, games=options.games, transactions=0, deposits=0, withdrawals=0)
+        total = Game.query.count()
+
+        catalog = Catalog('bench_catalog')
+        build = timed(catalog._rebuild, 5)
+        catalog._fresh()
+        print(f"{total} games; full index build p50 {statistics.median(build):.1f} ms")
+
+        print(f"{'query':<34} {'hits':>6} {'index p50/p95/p99 ms':>22} {'sql p50/p95/p99 ms':>22}")
+        index_samples = []
+        for q, category, sort, page in QUERIES:
+            result = catalog.search(q, category, sort, page, options.per_page)
+            expected = sql_search(q, category, sort, page, options.per_page)
+            # Titles can tie under SQL collation vs casefold; compare the sets of the page
+            if sort != 'title':
+                assert [card.id for card in result.items] == expected, (q, category, sort, page)
+            else:
+                assert len(result.items) == len(expected), (q, category, sort, page)
+            fast = timed(lambda: catalog.search(q, category, sort, page, options.per_page), options.repeat)
+            slow = timed(lambda: sql_search(q, category, sort, page, options.per_page), max(1, options.repeat // 10))
+            index_samples.extend(fast)
+            label = f"{q or '-'!r} {category or 'all'} {sort} p{page}"
+            print(f"{label:<34} {result.total:>6} {'%.2f / %.2f / %.2f' % percentiles(fast):>22} "
+                  f"{'%.2f / %.2f / %.2f' % percentiles(slow):>22}")
+
+        game = Game(title='Benchmark Bonanza Deluxe', category='slots')
+        db.session.add(game)
+        db.session.commit()
+        started = time.perf_counter()
+        catalog.add(game)
+        print(f"incremental add {(time.perf_counter() - started) * 1000:.2f} ms")
+        assert catalog.search('deluxe').total == 1
+
+    client = app.test_client()
+    for url in ('/games?q=dragon&sort=title', '/games?page=100', '/games/search.json?q=dra'):
+        # A fresh query string each time, so /games renders instead of hitting the page cache
+        bust = iter(range(10**9))
+        samples = timed(lambda: client.get(f'{url}&_={next(bust)}'), 50)
+        print(f"GET {url:<30} p50 {statistics.median(samples):.1f} ms")
+
+    p50, p95, p99 = percentiles(index_samples)
+    print(f"index overall p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms")
+    if p95 > options.max_p95_ms:
+        print(f"p95 above {options.max_p95_ms} ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""CPU cost versus bytes saved for compressing the real templates.
+
+Seeds a temporary database with a catalog of games and a page of deposits
+and withdrawals, renders the heaviest pages uncompressed, then times every
+gzip level / brotli quality in --levels on each body.
+
+    python benchmarks/bench_compression.py --games 500 --requests 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = [('/', False), ('/games', False), ('/admin/deposits', True), ('/admin/withdrawals', True),
+         ('/admin/users', True)]
+
+def seed(db, games, requests):
+    from models import User, Game, DepositRequest, WithdrawalRequest
+
+    db.session.add_all(Game(title=f'Game {number}', category=('slots', 'crash', 'live')[number % 3],
+                            thumbnail=f'{number:02x}/{number:064x}.png')
+                       for number in range(games))
+    users = [User(full_name=f'Player {number}', phone=f'bench-{number}', password_hash='-')
+             for number in range(requests)]
+    db.session.add_all(users)
+    db.session.flush()
+    for user in users:
+        db.session.add(DepositRequest(user_id=user.id, amount=50, payment_method='bKash',
+                                      transaction_id=f'TX{user.id:08d}'))
+        db.session.add(WithdrawalRequest(user_id=user.id, amount=20, payment_method='Nagad',
+                                         account_details=f'Account {user.id}\nBranch main'))
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200, help='users with one deposit and withdrawal each')
+    parser.add_argument('--levels', default='gzip:1,gzip:6,gzip:9,br:4,br:11')
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from app import create_app, db
+    from utils.compression import CompressionMiddleware, brotli
+    from utils.migrations import bootstrap
+
+    app = create_app({'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        bootstrap()
+        seed(db, options.games, options.requests)
+
+    client = app.test_client()
+    admin = app.test_client()
+    admin.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+    bodies = {}
+    for path, needs_admin in PAGES:
+        response = (admin if needs_admin else client).get(path)  # no Accept-Encoding, so uncompressed
+        bodies[path] = response.data
+
+    print(f"{'page':<20} {'raw KiB':>8} {'method':>8} {'KiB':>7} {'saved':>6} {'ms/page':>8} {'MiB/s':>7}")
+    for path, body in bodies.items():
+        for spec in options.levels.split(','):
+            encoding, level = spec.split(':')
+            if encoding == 'br' and brotli is None:
+                continue
+            compressor = CompressionMiddleware(None, level=int(level), brotli_quality=int(level))
+            started = time.perf_counter()
+            for _ in range(options.repeat):
+                compressed = compressor.compress(body, encoding)
+            elapsed = (time.perf_counter() - started) / options.repeat
+            print(f"{path:<20} {len(body) / 1024:>8.1f} {spec:>8} {len(compressed) / 1024:>7.1f} "
+                  f"{1 - len(compressed) / len(body):>6.0%} {elapsed * 1000:>8.2f} "
+                  f"{len(body) / elapsed / 1024 / 1024:>7.0f}")
+    if brotli is None:
+        print('brotli is not installed, skipped br levels')
+
+if __name__ == '__main__':
+    main()
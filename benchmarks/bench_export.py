@@ -0,0 +1,89 @@
+"""Memory and speed of the streaming exports on a multi-million-row database.
+
+Seeds --transactions rows spread over a year (see seed.py), then downloads
+/admin/export/transactions through the app twice: once for the last
+--window-days and once for the whole year, about 12x the rows. Python heap
+peaks are measured with tracemalloc. Exits 1 when the full export peaks at
+more than --max-growth times the small one or above --max-mib, i.e. when
+memory grows with the row count instead of staying flat.
+
+    python benchmarks/bench_export.py --transactions 2000000
+    python benchmarks/bench_export.py --database-url sqlite:////tmp/bench.db --format ndjson --gzip
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def download(client, url):
+    """Consume a streamed response chunk by chunk; returns (bytes, seconds, peak heap bytes)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200, response.status_code
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='an already seeded database; defaults to a fresh temporary SQLite file')
+    parser.add_argument('--transactions', type=int, default=2000000)
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--window-days', type=int, default=30)
+    parser.add_argument('--max-growth', type=float, default=1.5)
+    parser.add_argument('--max-mib', type=float, default=64)
+    options = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = options.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}"
+    from app import create_app, db
+    from models import Transaction
+    from utils.migrations import bootstrap
+    from seed import seed
+
+    app = create_app({'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        bootstrap()
+        if options.database_url is None:
+            started = time.perf_counter()
+            seed(db, users=10000, transactions=options.transactions, deposits=0, withdrawals=0)
+            print(f"Seeded {options.transactions} transactions in {time.perf_counter() - started:.1f}s")
+        total = Transaction.query.count()
+
+    client = app.test_client()
+    assert client.post('/admin/login', data={'username': 'admin', 'password': 'admin'}).status_code == 302
+    query = f"format={options.format}{'&gzip=1' if options.gzip else ''}"
+    since = (date.today() - timedelta(days=options.window_days)).isoformat()
+
+    print(f"{'export':<16} {'MiB out':>8} {'seconds':>8} {'rows/s':>10} {'peak MiB':>9}")
+    peaks = {}
+    for label, url, rows in (
+            (f'last {options.window_days} days', f'/admin/export/transactions?since={since}&{query}',
+             total * options.window_days / 365),
+            ('everything', f'/admin/export/transactions?{query}', total)):
+        size, elapsed, peak = download(client, url)
+        peaks[label] = peak
+        print(f"{label:<16} {size / 2**20:>8.1f} {elapsed:>8.1f} {rows / elapsed:>10.0f} {peak / 2**20:>9.2f}")
+
+    small, full = peaks.values()
+    if full > small * options.max_growth or full > options.max_mib * 2**20:
+        print(f"Memory grows with the export size: {small / 2**20:.2f} MiB -> {full / 2**20:.2f} MiB")
+        sys.exit(1)
+    print(f"Memory stays flat: {small / 2**20:.2f} MiB -> {full / 2**20:.2f} MiB for {total} rows")
+
+if __name__ == '__main__':
+    main()
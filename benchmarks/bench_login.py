@@ -0,0 +1,112 @@
+"""Login throughput and tail latency versus password hashing pool size.
+
+For each pool size, --clients threads log in as fast as they can for
+--seconds while one more thread keeps fetching the homepage. The homepage
+latency shows whether logins are starving the rest of the worker. Pool size 0
+hashes inline on the request thread, which is how logins worked before
+utils/passwords.py existed.
+
+    python benchmarks/bench_login.py --workers 0,1,2,4 --clients 16
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(app, workers, clients, seconds, users):
+    from utils import passwords
+
+    passwords.shutdown()
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    deadline = time.perf_counter() + seconds
+    logins, busy, failed, homepage = [], [0], [0], []
+    lock = threading.Lock()
+
+    def login_client(number):
+        client = app.test_client()
+        phone, password = users[number % len(users)]
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={'phone_or_username': phone, 'password': password})
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 302:
+                    logins.append(elapsed)
+                elif response.status_code == 503:
+                    busy[0] += 1
+                else:
+                    failed[0] += 1
+            if response.status_code == 503:
+                time.sleep(0.05)  # a real client backs off before retrying
+
+    def homepage_client():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/', headers={'Cache-Control': 'no-cache'})
+            homepage.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_client, args=(number,)) for number in range(clients)]
+    threads.append(threading.Thread(target=homepage_client))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ms = lambda value: value * 1000
+    print(f"{workers:>7} {len(logins) / seconds:>9.1f} {ms(statistics.median(logins)) if logins else 0:>8.1f} "
+          f"{ms(percentile(logins, 95)):>8.1f} {ms(percentile(logins, 99)):>8.1f} {busy[0]:>6} {failed[0]:>6} "
+          f"{ms(statistics.median(homepage)):>10.1f} {ms(percentile(homepage, 99)):>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='0,1,2,4', help='comma separated pool sizes to try')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--max-queue', type=int, default=8)
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    options = parser.parse_args()
+
+    if not options.database_url:
+        options.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['DATABASE_URL'] = options.database_url
+
+    from app import create_app, db
+    from models import User
+    from utils.migrations import bootstrap
+
+    app = create_app({'LOG_LEVEL': 'WARNING', 'PASSWORD_HASH_MAX_QUEUE': options.max_queue,
+                      'PASSWORD_HASH_WORKERS': 0})
+    users = []
+    with app.app_context():
+        bootstrap()
+        for number in range(options.users):
+            phone, password = f'bench-{number}-{time.time_ns()}', f'password-{number}'
+            user = User(full_name=f'Bench {number}', phone=phone)
+            user.set_password(password)
+            db.session.add(user)
+            users.append((phone, password))
+        db.session.commit()
+
+    print(f"{options.clients} login clients, {options.seconds:.0f}s per run, queue limit {options.max_queue}")
+    print(f"{'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'busy':>6} {'failed':>6} "
+          f"{'home p50':>10} {'home p99':>10}")
+    for workers in (int(value) for value in options.workers.split(',')):
+        run(app, workers, options.clients, options.seconds, users)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Scripted load test of the real app with a regression check.
+
+Seeds a synthetic dataset (see seed.py) unless --database-url points at one
+that is already seeded, then drives the app in-process with --clients
+threads through these scenarios:
+
+    browse   homepage, full catalog, one category, a search, type-ahead, a game page, leaderboard
+    login    player login (password hashing included)
+    deposit  deposit form, deposit submission, player dashboard
+    admin    admin dashboard, pending deposits, users, withdrawals, 365-day report
+    approve  approving pending deposits one at a time
+
+and prints throughput and p50/p95/p99 latency per endpoint. The results are
+written to --output. With --save-baseline they become the baseline; otherwise
+they are compared against it and the run exits 1 when an endpoint's p95 is
+more than --tolerance slower, its throughput that much lower, or it returned
+errors. Baselines are machine specific, so record one on the machine that
+runs the comparison.
+
+    python benchmarks/run_suite.py --users 50000 --transactions 2000000 --save-baseline
+    python benchmarks/run_suite.py --users 50000 --transactions 2000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('browse', 'login', 'deposit', 'admin', 'approve')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'results', 'baseline.json')
+
+def percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Recorder:
+    """Latency samples and error counts per endpoint, shared by the client threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def request(self, client, name, method, url, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if response.status_code not in expect:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+SEARCH_PREFIXES = ('dr', 'gold', 'lucky', 'roul', 'sl', 'jack', 'mega spin', 'cr')
+
+class Context:
+    """What the scenarios need to pick realistic targets"""
+
+    def __init__(self, app, users):
+        from models import Game, DepositRequest
+
+        with app.app_context():
+            self.game_ids = [game_id for game_id, in Game.query.filter_by(is_active=True).with_entities(Game.id)]
+            self.categories = sorted({category for category, in Game.query.with_entities(Game.category).distinct()})
+            pending = DepositRequest.query.filter_by(status='pending').with_entities(DepositRequest.id)
+            self.pending_deposits = [deposit_id for deposit_id, in pending.order_by(DepositRequest.id)]
+        self.users = users
+        self.lock = threading.Lock()
+
+    def next_pending_deposit(self):
+        with self.lock:
+            return self.pending_deposits.pop() if self.pending_deposits else None
+
+def _player_login(recorder, client, rng, context, name='POST /auth/login'):
+    number = rng.randrange(1, context.users + 1)
+    return recorder.request(client, name, 'POST', '/auth/login', expect=(302,),
+                            data={'phone_or_username': f'01{number:09d}', 'password': 'password'})
+
+def _admin_login(app):
+    client = app.test_client()
+    response = client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+    if response.status_code != 302:
+        raise SystemExit('Admin login failed; run the suite against a database bootstrapped with the default admin')
+    return client
+
+def browse(app, recorder, rng, context, iterations):
+    client = app.test_client()
+    for _ in range(iterations):
+        recorder.request(client, 'GET /', 'GET', '/')
+        recorder.request(client, 'GET /games', 'GET', '/games')
+        if context.categories:
+            recorder.request(client, 'GET /games?category=<category>', 'GET',
+                             f'/games?category={rng.choice(context.categories)}')
+        prefix = rng.choice(SEARCH_PREFIXES)
+        recorder.request(client, 'GET /games?q=<prefix>', 'GET', f'/games?q={prefix}&page={rng.randrange(1, 4)}')
+        recorder.request(client, 'GET /games/search.json?q=<prefix>', 'GET', f'/games/search.json?q={prefix}')
+        if context.game_ids:
+            recorder.request(client, 'GET /games/<id>', 'GET', f'/games/{rng.choice(context.game_ids)}')
+        recorder.request(client, 'GET /leaderboard', 'GET', '/leaderboard')
+
+def login(app, recorder, rng, context, iterations):
+    for _ in range(iterations):
+        _player_login(recorder, app.test_client(), rng, context)
+
+def deposit(app, recorder, rng, context, iterations):
+    client = app.test_client()
+    if _player_login(recorder, client, rng, context, name='POST /auth/login (deposit)').status_code != 302:
+        return
+    for number in range(iterations):
+        recorder.request(client, 'GET /user/deposit', 'GET', '/user/deposit')
+        recorder.request(client, 'POST /user/deposit', 'POST', '/user/deposit', expect=(302,),
+                         data={'amount': rng.randrange(100, 50000) / 100, 'payment_method': 'bKash',
+                               'transaction_id': f'BENCH{threading.get_ident()}-{number}'})
+        recorder.request(client, 'GET /user/dashboard', 'GET', '/user/dashboard')
+
+def admin(app, recorder, rng, context, iterations):
+    client = _admin_login(app)
+    year_ago = (date.today() - timedelta(days=365)).isoformat()
+    for _ in range(iterations):
+        recorder.request(client, 'GET /admin/dashboard', 'GET', '/admin/dashboard')
+        recorder.request(client, 'GET /admin/deposits?status=pending', 'GET', '/admin/deposits?status=pending')
+        recorder.request(client, 'GET /admin/users', 'GET', '/admin/users')
+        recorder.request(client, 'GET /admin/withdrawals', 'GET', '/admin/withdrawals')
+        recorder.request(client, 'GET /admin/reports (365 days)', 'GET', f'/admin/reports?since={year_ago}')
+
+def approve(app, recorder, rng, context, iterations):
+    client = _admin_login(app)
+    for _ in range(iterations):
+        deposit_id = context.next_pending_deposit()
+        if deposit_id is None:
+            return
+        recorder.request(client, 'POST /admin/deposits/<id>/process', 'POST',
+                         f'/admin/deposits/{deposit_id}/process', expect=(302,), data={'action': 'approve'})
+
+def run_scenario(app, name, context, clients, iterations, rng_seed):
+    recorder = Recorder()
+    scenario = globals()[name]
+    per_client = max(1, iterations // clients)
+    threads = [threading.Thread(target=scenario,
+                                args=(app, recorder, random.Random(rng_seed + number), context, per_client))
+               for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    results = {}
+    for endpoint, samples in recorder.samples.items():
+        results[f'{name}: {endpoint}'] = {
+            'requests': len(samples), 'errors': recorder.errors.get(endpoint, 0),
+            'rps': len(samples) / wall,
+            'p50_ms': percentile(samples, 50) * 1000, 'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000}
+    return results
+
+def compare(results, baseline, tolerance):
+    """Human readable regressions of results against baseline"""
+    regressions = []
+    for endpoint, result in sorted(results.items()):
+        if result['errors']:
+            regressions.append(f"{endpoint}: {result['errors']} of {result['requests']} requests failed")
+        before = baseline.get(endpoint)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {result['p95_ms']:.1f} ms, baseline {before['p95_ms']:.1f} ms")
+        if result['rps'] < before['rps'] / (1 + tolerance):
+            regressions.append(f"{endpoint}: {result['rps']:.1f} req/s, baseline {before['rps']:.1f} req/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='an already seeded database; defaults to a fresh temporary SQLite file')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--deposits', type=int, default=20000)
+    parser.add_argument('--withdrawals', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--clients', type=int, default=4, help='concurrent client threads per scenario')
+    parser.add_argument('--iterations', type=int, default=200, help='scenario iterations, split across clients')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    options = parser.parse_args()
+
+    scenarios = [name.strip() for name in options.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.environ['DATABASE_URL'] = options.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}"
+    from app import create_app, db
+    from models import User
+    from utils.migrations import bootstrap
+    from seed import seed
+
+    app = create_app({'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        bootstrap()
+        if options.database_url is None:
+            seeded = seed(db, users=options.users, games=options.games, transactions=options.transactions,
+                          deposits=options.deposits, withdrawals=options.withdrawals, rng_seed=options.seed)
+            print(f"Seeded in {sum(seeded['timings'].values()):.1f}s")
+        users = User.query.count()
+
+    context = Context(app, users)
+    results = {}
+    for number, name in enumerate(scenarios):
+        results.update(run_scenario(app, name, context, options.clients, options.iterations,
+                                    options.seed + number * 1000))
+
+    print(f"{'endpoint':<58} {'req':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, result in results.items():
+        print(f"{endpoint:<58} {result['requests']:>6} {result['errors']:>4} {result['rps']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(options.output)), exist_ok=True)
+    with open(options.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if options.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(options.baseline)), exist_ok=True)
+        with open(options.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {options.baseline}")
+        return
+    if not os.path.exists(options.baseline):
+        print(f"No baseline at {options.baseline}; run with --save-baseline first")
+        return
+    with open(options.baseline) as f:
+        regressions = compare(results, json.load(f), options.tolerance)
+    if regressions:
+        print('Regressions:')
+        for line in regressions:
+            print(f'  {line}')
+        sys.exit(1)
+    print(f'No regressions against the baseline (tolerance {options.tolerance:.0%})')
+
+if __name__ == '__main__':
+    main()
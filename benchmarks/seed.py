@@ -0,0 +1,179 @@
+"""Synthetic dataset generator for the benchmark suite.
+
+Creates users with referral chains, games, sliders, payment methods and as
+many Transaction / DepositRequest / WithdrawalRequest rows as asked for,
+using chunked executemany INSERTs. The same --seed always produces the same
+data. Every user's password is "password" (hashed once and shared), and
+balances match the sum of each user's transactions.
+
+    python benchmarks/seed.py --database-url sqlite:////tmp/bench.db --users 50000 --transactions 2000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHUNK = 20000
+PASSWORD = 'password'
+CATEGORIES = ('slots', 'crash', 'live', 'table', 'lottery')
+PAYMENT_METHODS = ('bKash', 'Nagad', 'Rocket')
+TITLE_WORDS = (('Golden', 'Lucky', 'Mega', 'Royal', 'Wild', 'Super', 'Dragon', 'Fortune', 'Diamond', 'Neon',
+                'Aztec', 'Pharaoh', 'Viking', 'Cosmic', 'Jungle', 'Ocean', 'Fire', 'Frozen', 'Mystic', 'Turbo'),
+               ('Spins', 'Roulette', 'Blackjack', 'Baccarat', 'Rocket', 'Jackpot', 'Treasure', 'Fruits',
+                'Gems', 'Riches', 'Wheel', 'Dice', 'Aviator', 'Bonanza', 'Legends', 'Poker', 'Keno', 'Crash'))
+
+def _insert(connection, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        connection.execute(table.insert(), rows[start:start + CHUNK])
+
+def _stream(connection, table, generate, count):
+    """Insert count generated rows without holding them all in memory"""
+    batch = []
+    for number in range(count):
+        batch.append(generate(number))
+        if len(batch) == CHUNK:
+            connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+
+def seed(db, users=10000, games=500, sliders=5, transactions=200000, deposits=50000, withdrawals=20000,
+         referral_rate=0.4, pending_rate=0.05, days=365, rng_seed=1):
+    """Fill an empty, bootstrapped database. Returns a dict of row counts and timings."""
+    from werkzeug.security import generate_password_hash
+    from models import User, Game, HomepageSlider, PaymentMethod, Transaction, DepositRequest, WithdrawalRequest
+    from utils import stats, rollups
+    from utils.passwords import hash_method
+
+    rng = random.Random(rng_seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span = int((now - start).total_seconds())
+    moment = lambda: start + timedelta(seconds=rng.randrange(span))
+    password_hash = generate_password_hash(PASSWORD, method=hash_method())
+    timings = {}
+
+    with db.engine.begin() as connection:
+        if db.engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('PRAGMA synchronous=OFF')
+
+        started = time.perf_counter()
+        # Referrers always come earlier, so chains form naturally: 1 <- 40 <- 900 <- ...
+        user_rows = []
+        for number in range(users):
+            referrer = rng.randrange(1, number + 1) if number and rng.random() < referral_rate else None
+            user_rows.append({'id': number + 1, 'full_name': f'Player {number + 1}', 'phone': f'01{number + 1:09d}',
+                              'username': f'player{number + 1}', 'password_hash': password_hash,
+                              'referral_code': f'R{number + 1:07X}', 'referred_by': referrer,
+                              'is_active': True, 'created_at': moment()})
+        for row in user_rows:
+            row['referral_count'] = 0
+        for row in user_rows:
+            if row['referred_by']:
+                user_rows[row['referred_by'] - 1]['referral_count'] += 1
+        for row in user_rows:
+            row['referral_commission_minor'] = sum(rng.randrange(100, 5000) for _ in range(row['referral_count']))
+        _insert(connection, User.__table__, user_rows)
+        timings['users'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _insert(connection, Game.__table__, [
+            {'title': f'{rng.choice(TITLE_WORDS[0])} {rng.choice(TITLE_WORDS[1])} {number + 1}',
+             'category': CATEGORIES[number % len(CATEGORIES)],
+             'thumbnail': f'{number % 256:02x}/{number:064x}.png', 'winning_percentage': 50.0,
+             'min_bet': float(rng.choice((0.1, 0.5, 1, 5, 10))), 'max_bet': 1000.0,
+             'is_active': rng.random() > 0.05, 'created_at': moment()}
+            for number in range(games)])
+        _insert(connection, HomepageSlider.__table__, [
+            {'title': f'Promotion {number + 1}', 'image_path': f'{number:02x}/{number:064x}.jpg',
+             'order_position': number, 'is_active': True, 'created_at': moment()}
+            for number in range(sliders)])
+        _insert(connection, PaymentMethod.__table__, [
+            {'name': name, 'account_number': f'017{number:08d}', 'instructions': f'Send money to the {name} number',
+             'is_active': True} for number, name in enumerate(PAYMENT_METHODS)])
+        timings['catalog'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        balances = [0] * (users + 1)
+
+        def transaction(number):
+            user_id = rng.randrange(1, users + 1)
+            kind = rng.choices(('deposit', 'withdrawal', 'bonus', 'referral'), (6, 2, 1, 1))[0]
+            amount = rng.randrange(100, 50000)
+            if kind == 'withdrawal':
+                amount = -min(amount, balances[user_id])
+            balances[user_id] += amount
+            return {'user_id': user_id, 'type': kind, 'amount_minor': amount,
+                    'description': f'Seeded {kind}', 'created_at': moment()}
+
+        _stream(connection, Transaction.__table__, transaction, transactions)
+        timings['transactions'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        status = lambda: 'pending' if rng.random() < pending_rate else rng.choice(('approved', 'approved', 'rejected'))
+
+        def deposit(number):
+            created = moment()
+            state = status()
+            return {'user_id': rng.randrange(1, users + 1), 'amount': rng.randrange(100, 50000) / 100,
+                    'payment_method': rng.choice(PAYMENT_METHODS), 'transaction_id': f'TX{number:010d}',
+                    'status': state, 'bonus_amount': 0.0, 'created_at': created,
+                    'processed_at': None if state == 'pending' else created + timedelta(hours=1)}
+
+        def withdrawal(number):
+            created = moment()
+            state = status()
+            return {'user_id': rng.randrange(1, users + 1), 'amount': rng.randrange(100, 20000) / 100,
+                    'payment_method': rng.choice(PAYMENT_METHODS), 'account_details': f'Wallet 01{number:09d}',
+                    'status': state, 'created_at': created,
+                    'processed_at': None if state == 'pending' else created + timedelta(hours=1)}
+
+        _stream(connection, DepositRequest.__table__, deposit, deposits)
+        _stream(connection, WithdrawalRequest.__table__, withdrawal, withdrawals)
+        timings['requests'] = time.perf_counter() - started
+
+        table = User.__table__
+        balance_rows = [{'user_id': user_id, 'balance': balance}
+                        for user_id, balance in enumerate(balances) if balance]
+        if balance_rows:
+            connection.execute(table.update().where(table.c.id == db.bindparam('user_id'))
+                               .values(balance_minor=db.bindparam('balance')), balance_rows)
+
+    stats.rebuild_platform_stats()
+    rollups.backfill(db.session)
+    db.session.commit()
+    return {'users': users, 'games': games, 'transactions': transactions, 'deposits': deposits,
+            'withdrawals': withdrawals, 'timings': timings}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--deposits', type=int, default=50000)
+    parser.add_argument('--withdrawals', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = options.database_url
+    from app import create_app, db
+    from utils.migrations import bootstrap
+
+    app = create_app({'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        bootstrap()
+        result = seed(db, users=options.users, games=options.games, transactions=options.transactions,
+                      deposits=options.deposits, withdrawals=options.withdrawals, rng_seed=options.seed)
+    for name, seconds in result['timings'].items():
+        print(f"{name:<13} {seconds:6.1f}s")
+    rows = options.users + options.transactions + options.deposits + options.withdrawals
+    print(f"Seeded {rows} rows in {sum(result['timings'].values()):.1f}s")
+
+if __name__ == '__main__':
+    main()
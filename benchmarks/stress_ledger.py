@@ -0,0 +1,99 @@
+"""Concurrent ledger stress test.
+
+Several processes credit and debit the same few users at once through
+utils/ledger.py. Afterwards every user's balance must equal the sum of their
+Transaction rows to the cent, otherwise an update was lost.
+
+    python benchmarks/stress_ledger.py --processes 8 --operations 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def _worker(args):
+    seed, operations, user_ids = args
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from utils import ledger
+    from utils.ledger import Posting
+
+    app = create_app()
+
+    rng = random.Random(seed)
+    applied = refused = retries = 0
+    with app.app_context():
+        for _ in range(operations):
+            posting = Posting(rng.choice(user_ids), 'balance', rng.randint(-500, 1000), 'stress', 'stress test')
+            while True:
+                try:
+                    ledger.post([posting])
+                    db.session.commit()
+                    applied += 1
+                except ledger.InsufficientFunds:
+                    db.session.rollback()
+                    refused += 1
+                except OperationalError:
+                    # SQLite allows one writer at a time; a real database would just wait on the row lock
+                    db.session.rollback()
+                    retries += 1
+                    time.sleep(0.001)
+                    continue
+                break
+    return applied, refused, retries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=500, help='operations per process')
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    options = parser.parse_args()
+
+    if not options.database_url:
+        options.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    os.environ['DATABASE_URL'] = options.database_url
+
+    from app import create_app, db
+    from models import User, Transaction
+    from utils.migrations import bootstrap
+
+    app = create_app()
+    with app.app_context():
+        bootstrap()
+        users = [User(full_name=f'Stress {i}', phone=f'stress-{i}-{time.time_ns()}', password_hash='-')
+                 for i in range(options.users)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+    started = time.perf_counter()
+    with Pool(options.processes) as pool:
+        results = pool.map(_worker, [(seed, options.operations, user_ids) for seed in range(options.processes)])
+    elapsed = time.perf_counter() - started
+
+    applied = sum(result[0] for result in results)
+    refused = sum(result[1] for result in results)
+    retries = sum(result[2] for result in results)
+    print(f"{applied} postings applied, {refused} refused for insufficient funds, "
+          f"{retries} lock retries in {elapsed:.2f}s ({applied / elapsed:.0f}/s)")
+
+    drift = False
+    with app.app_context():
+        for user_id in user_ids:
+            balance = db.session.get(User, user_id).balance_minor
+            ledgered = db.session.query(db.func.coalesce(db.func.sum(Transaction.amount_minor), 0))\
+                .filter_by(user_id=user_id).scalar()
+            status = 'ok' if balance == ledgered else 'DRIFT'
+            drift = drift or balance != ledgered or balance < 0
+            print(f"user {user_id}: balance={balance} transactions={ledgered} {status}")
+    sys.exit(1 if drift else 0)
+
+if __name__ == '__main__':
+    main()
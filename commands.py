@@ -0,0 +1,235 @@
+# Flask CLI commands (run with `flask --app main <group> <command>`)
+import click
+from flask.cli import AppGroup, with_appcontext
+from app import db
+
+@click.command('bootstrap')
+@with_appcontext
+@click.option('--admin-password', envvar='ADMIN_PASSWORD', default='admin', show_default=True,
+              help='Password for the default admin if it has to be created.')
+def bootstrap(admin_password):
+    """Create tables, apply migrations, create the upload folder and the default admin (run once per deploy)"""
+    import os
+    from flask import current_app
+    from utils import assets, metrics
+    from utils.migrations import bootstrap as bootstrap_database
+    
+    applied, admin_created = bootstrap_database(admin_password)
+    click.echo(f"Applied migrations: {', '.join(map(str, applied))}" if applied else 'Schema is up to date')
+    
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    assets.build(current_app)
+    click.echo('Static assets built')
+    metrics.clear(current_app)  # counters of the previous release's workers
+    
+    if admin_created:
+        click.echo('Default admin user created (username: admin)')
+        if admin_password == 'admin':
+            click.echo('Change the default admin password after the first login!')
+
+stats_cli = AppGroup('stats', help='Admin dashboard statistics summary.')
+
+@stats_cli.command('rebuild')
+@click.option('--check', is_flag=True, help='Only compare the stored summary with the live tables.')
+def rebuild_stats(check):
+    """Recompute the dashboard summary from the request tables"""
+    from models import PlatformStats
+    from utils.stats import STATS_ID, COUNTER_FIELDS, compute_platform_stats, get_platform_stats, rebuild_platform_stats
+    
+    stored = get_platform_stats() if db.session.get(PlatformStats, STATS_ID) else None
+    live = compute_platform_stats()
+    
+    drift = False
+    for name in COUNTER_FIELDS:
+        stored_value = stored[name] if stored else None
+        if stored_value is None or stored_value != live[name]:
+            drift = True
+            click.echo(f"{name}: stored={stored_value} live={live[name]}")
+    
+    if check:
+        click.echo('Summary drifted from live tables' if drift else 'Summary matches live tables')
+        if drift:
+            raise SystemExit(1)
+        return
+    
+    rebuild_platform_stats()
+    db.session.commit()
+    click.echo('Dashboard summary rebuilt')
+
+@stats_cli.command('rollups')
+@click.option('--since', help='First day to rebuild (YYYY-MM-DD, default: the beginning).')
+@click.option('--until', help='Last day to rebuild (YYYY-MM-DD, default: the latest).')
+@click.option('--check', is_flag=True, help='Only compare the stored rollups with the request tables.')
+def rebuild_rollups(since, until, check):
+    """Backfill the daily report rollups from the request tables"""
+    from utils import rollups
+    from utils.exports import parse_day
+    
+    try:
+        since, until = parse_day(since), parse_day(until)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    
+    if check:
+        stored = rollups.stored(since, until)
+        live = rollups.compute(db.session, since, until)
+        drift = sorted(key for key in stored.keys() | live.keys() if stored.get(key) != live.get(key))
+        for key in drift:
+            click.echo(f"{' '.join(str(part) for part in key)}: stored={stored.get(key)} live={live.get(key)}")
+        click.echo('Rollups drifted from the request tables' if drift else 'Rollups match the request tables')
+        if drift:
+            raise SystemExit(1)
+        return
+    
+    rows = rollups.backfill(db.session, since, until)
+    db.session.commit()
+    click.echo(f"Rebuilt {rows} rollup rows")
+
+db_cli = AppGroup('db', help='Schema migrations and index checks.')
+
+@db_cli.command('upgrade')
+def db_upgrade():
+    """Create missing tables and apply pending schema migrations"""
+    from utils.migrations import upgrade
+    
+    db.create_all()
+    applied = upgrade()
+    click.echo(f"Applied migrations: {', '.join(map(str, applied))}" if applied else 'Schema is up to date')
+
+@db_cli.command('current')
+def db_current():
+    """Show the schema version of the configured database"""
+    from utils.migrations import MIGRATIONS, current_version, schema_version
+    
+    schema_version.create(bind=db.engine, checkfirst=True)
+    with db.engine.connect() as connection:
+        version = current_version(connection)
+    click.echo(f"Schema version {version} (latest {MIGRATIONS[-1][0]})")
+
+@db_cli.command('explain')
+def db_explain():
+    """Fail if a hot query falls back to a full table scan (run against a populated database)"""
+    from utils.migrations import explain_full_scans
+    
+    with db.engine.connect() as connection:
+        problems = explain_full_scans(connection)
+    for name, plan in problems.items():
+        click.echo(f"{name}: full scan")
+        for line in plan:
+            click.echo(f"    {line}")
+    if problems:
+        raise SystemExit(1)
+    click.echo('All hot queries use an index')
+
+@db_cli.command('diagnostics')
+def db_diagnostics():
+    """Summarize the N+1 and slow-query findings written by SQL_DIAGNOSTICS=1 workers"""
+    from flask import current_app
+    from utils.sql_diagnostics import merged_summary
+    
+    findings = merged_summary(current_app.instance_path)
+    if not findings:
+        click.echo('No findings (run the workers with SQL_DIAGNOSTICS=1 and stop them to write a summary)')
+    for finding in findings:
+        kind = []
+        if finding['requests']:
+            kind.append(f"N+1 in {finding['requests']} requests, up to {finding['max_repeats']}x")
+        if finding['slow']:
+            kind.append(f"{finding['slow']} slow, max {finding['max_ms']:.0f} ms")
+        click.echo(f"{finding['endpoint']} at {finding['origin']}: {'; '.join(kind)}")
+        click.echo(f"    {finding['statement'][:300]}")
+
+users_cli = AppGroup('users', help='Player account maintenance.')
+
+@users_cli.command('import')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--workers', type=int, default=None, help='Password hashing processes (default: CPU count).')
+@click.option('--hash-method', default=None, help='Werkzeug hash method, e.g. "scrypt" (default: Werkzeug default).')
+def import_users(csv_file, chunk_size, workers, hash_method):
+    """Import players from CSV_FILE (full_name, phone, password, [username, referral_code, referred_by])"""
+    import csv
+    from utils.user_import import import_users as run_import
+    
+    def progress(inserted, seconds):
+        click.echo(f"{inserted} users imported ({inserted / max(seconds, 1e-9):.0f} rows/sec)")
+    
+    try:
+        report = run_import(csv.DictReader(csv_file), chunk_size=chunk_size, workers=workers,
+                            hash_method=hash_method, progress=progress)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint='CSV_FILE')
+    for phone, reason in report['skipped']:
+        click.echo(f"skipped {phone}: {reason}")
+    click.echo(f"Imported {report['inserted']} users in {report['seconds']:.1f}s "
+               f"({report['inserted'] / max(report['seconds'], 1e-9):.0f} rows/sec), "
+               f"{len(report['skipped'])} skipped, {report['referrals']} referrals linked, "
+               f"{report['unresolved_referrals']} unresolved")
+
+@users_cli.command('referrals')
+@click.option('--check', is_flag=True, help='Only list players whose stored referral count is wrong.')
+def recount_referrals(check):
+    """Recompute every player's referral count from referred_by"""
+    from utils import referrals
+    
+    if check:
+        drifted = referrals.drifted()
+        for user_id, stored, live in drifted:
+            click.echo(f"user {user_id}: stored={stored} live={live}")
+        click.echo('Referral counts drifted' if drifted else 'Referral counts match')
+        if drifted:
+            raise SystemExit(1)
+        return
+    
+    referrals.recount(db.session)
+    db.session.commit()
+    click.echo('Referral counts rebuilt')
+
+storage_cli = AppGroup('storage', help='Uploaded file storage.')
+
+@storage_cli.command('gc')
+@click.option('--grace-hours', default=24.0, show_default=True,
+              help='Keep unreferenced files younger than this (uploads still being saved).')
+@click.option('--dry-run', is_flag=True, help='Only list what would be removed.')
+def storage_gc(grace_hours, dry_run):
+    """Remove uploaded files no deposit, game or slider references"""
+    from utils.storage import collect_garbage
+    
+    removed, freed = collect_garbage(grace_seconds=grace_hours * 3600, dry_run=dry_run)
+    for path in removed:
+        click.echo(path)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} files ({freed / 1024 / 1024:.1f} MiB)")
+
+assets_cli = AppGroup('assets', help='Static asset pipeline.')
+
+@assets_cli.command('build')
+def assets_build():
+    """Fingerprint and precompress static files into static/dist"""
+    from flask import current_app
+    from utils.assets import build, brotli
+    
+    manifest = build(current_app)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+    if brotli is None:
+        click.echo('brotli is not installed, only gzip variants were written')
+
+@click.command('export')
+@with_appcontext
+@click.argument('kind', type=click.Choice(['transactions', 'deposits', 'withdrawals']))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--since', help='First day to include (YYYY-MM-DD).')
+@click.option('--until', help='Last day to include (YYYY-MM-DD).')
+@click.option('--status', help='Request status (deposits, withdrawals) or transaction type.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Output file (default: stdout).')
+def export(kind, fmt, since, until, status, compress, output):
+    """Stream a CSV or NDJSON dump of KIND without loading it into memory"""
+    from utils import exports
+    
+    try:
+        body = exports.generate(kind, fmt, exports.parse_day(since), exports.parse_day(until), status, compress)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    for chunk in body:
+        output.write(chunk)
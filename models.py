@@ -1,22 +1,41 @@
 from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from decimal import Decimal
+from utils import passwords
 import secrets
 import string
 
+def from_minor(amount_minor):
+    """Integer minor units (cents) to a Decimal amount"""
+    return Decimal(amount_minor or 0).scaleb(-2)
+
+def _check_and_upgrade(account, password):
+    """Verify password and, if the stored hash uses outdated parameters, re-hash it (the caller commits)"""
+    if not passwords.verify_password(account.password_hash, password):
+        return False
+    if passwords.needs_rehash(account.password_hash):
+        try:
+            account.set_password(password)
+        except passwords.HashingBusy:
+            pass  # upgrade on a later login
+    return True
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), unique=True, nullable=False)
     username = db.Column(db.String(50), unique=True, nullable=True)
     password_hash = db.Column(db.String(256), nullable=False)
-    balance = db.Column(db.Float, default=0.0)
-    bonus_balance = db.Column(db.Float, default=0.0)
+    # Money is stored in integer minor units (cents) and only changed through utils/ledger.py
+    balance_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    bonus_balance_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
     referral_code = db.Column(db.String(10), unique=True, nullable=False)
     referred_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    referral_commission = db.Column(db.Float, default=0.0)
+    referral_commission_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    # Players with referred_by = id, kept in step by utils/referrals.py
+    referral_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now(), nullable=False)
     last_login = db.Column(db.DateTime)
     
     # Relationships
@@ -24,22 +43,47 @@ class User(db.Model):
     withdrawals = db.relationship('WithdrawalRequest', backref='user', lazy=True)
     referred_users = db.relationship('User', backref=db.backref('referrer', remote_side=[id]), lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_user_referred_by', 'referred_by'),
+        db.Index('ix_user_created', 'created_at', 'id'),
+        db.Index('ix_user_referred_created', 'referred_by', 'created_at', 'id'),
+        # Matches the leaderboard order (most commission first, earlier account first on ties)
+        db.Index('ix_user_referral_commission', referral_commission_minor.desc(), id),
+    )
+    
+    @property
+    def balance(self):
+        return from_minor(self.balance_minor)
+    
+    @property
+    def bonus_balance(self):
+        return from_minor(self.bonus_balance_minor)
+    
+    @property
+    def referral_commission(self):
+        return from_minor(self.referral_commission_minor)
+    
     def __init__(self, **kwargs):
         super(User, self).__init__(**kwargs)
         if not self.referral_code:
             self.referral_code = self.generate_referral_code()
     
     def generate_referral_code(self):
+        # Check a handful of candidates per query instead of one query per candidate
         while True:
-            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
-            if not User.query.filter_by(referral_code=code).first():
-                return code
+            candidates = {''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+                          for _ in range(4)}
+            taken = set(db.session.scalars(db.select(User.referral_code)
+                                           .where(User.referral_code.in_(candidates))))
+            free = candidates - taken
+            if free:
+                return free.pop()
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return _check_and_upgrade(self, password)
 
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -51,10 +95,10 @@ class Admin(db.Model):
     last_login = db.Column(db.DateTime)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return _check_and_upgrade(self, password)
 
 class Game(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -86,8 +130,13 @@ class DepositRequest(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     bonus_amount = db.Column(db.Float, default=0.0)
     admin_notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now(), nullable=False)
     processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_deposit_request_status_created', 'status', 'created_at'),
+        db.Index('ix_deposit_request_created', 'created_at', 'id'),
+    )
 
 class WithdrawalRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -97,8 +146,13 @@ class WithdrawalRequest(db.Model):
     account_details = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     admin_notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now(), nullable=False)
     processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_withdrawal_request_status_created', 'status', 'created_at'),
+        db.Index('ix_withdrawal_request_created', 'created_at', 'id'),
+    )
 
 class HomepageSlider(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -129,8 +183,70 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, bonus, referral
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
     description = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='transactions')
+    
+    @property
+    def amount(self):
+        return from_minor(self.amount_minor)
+    
+    __table_args__ = (
+        db.Index('ix_transaction_user_created', 'user_id', 'created_at'),
+    )
+
+class PlatformStats(db.Model):
+    """Single-row summary of dashboard counters, updated alongside the writes it counts"""
+    id = db.Column(db.Integer, primary_key=True)
+    total_users = db.Column(db.Integer, default=0, nullable=False)
+    total_games = db.Column(db.Integer, default=0, nullable=False)
+    total_deposits_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    total_withdrawals_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    stats_date = db.Column(db.Date)  # day the today_* counters belong to
+    today_deposits_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    today_withdrawals_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    pending_deposits = db.Column(db.Integer, default=0, nullable=False)
+    pending_withdrawals = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def total_deposits(self):
+        return from_minor(self.total_deposits_minor)
+    
+    @property
+    def total_withdrawals(self):
+        return from_minor(self.total_withdrawals_minor)
+    
+    @property
+    def today_deposits(self):
+        return from_minor(self.today_deposits_minor)
+    
+    @property
+    def today_withdrawals(self):
+        return from_minor(self.today_withdrawals_minor)
+
+class StoredFile(db.Model):
+    """An uploaded blob, stored once under its SHA-256 (see utils/storage.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)  # relative to UPLOAD_FOLDER
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyRollup(db.Model):
+    """Per-day totals of processed requests, maintained by utils/rollups.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # UTC day the request was processed
+    kind = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, referral
+    payment_method = db.Column(db.String(50), nullable=False, default='')  # '' for referral commissions
+    status = db.Column(db.String(20), nullable=False)  # approved, rejected
+    count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    amount_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    bonus_minor = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)  # deposit bonuses paid
+    
+    __table_args__ = (
+        db.UniqueConstraint('day', 'kind', 'payment_method', 'status', name='uq_daily_rollup_key'),
+    )
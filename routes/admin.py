@@ -1,11 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, session,
+                   jsonify, Response, stream_with_context, abort)
 from models import (Admin, User, Game, PaymentMethod, DepositRequest, 
-                   WithdrawalRequest, HomepageSlider, SiteSettings, Transaction)
+                   WithdrawalRequest, HomepageSlider, SiteSettings)
 from app import db
-from utils.helpers import admin_login_required, get_current_admin
+from utils.helpers import admin_login_required, get_current_admin, invalidate_site_settings
+from utils import stats, payments, ledger, storage, exports, rollups, referrals, leaderboard
+from utils.ledger import to_minor
+from utils.pagination import keyset_paginate, approximate_count
+from utils.query_counter import query_budget
+from utils.catalog import catalog
+from routes.main import invalidate_public_pages
+from utils.passwords import HashingBusy
 from datetime import datetime, timedelta
-from werkzeug.utils import secure_filename
-import os
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -17,7 +24,13 @@ def login():
         
         admin = Admin.query.filter_by(username=username).first()
         
-        if admin and admin.check_password(password) and admin.is_active:
+        try:
+            authenticated = admin is not None and admin.check_password(password)
+        except HashingBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('admin/login.html'), 503, {'Retry-After': '1'}
+        
+        if authenticated and admin.is_active:
             session['admin_id'] = admin.id
             admin.last_login = datetime.utcnow()
             db.session.commit()
@@ -35,44 +48,41 @@ def logout():
 @bp.route('/dashboard')
 @admin_login_required
 def dashboard():
-    # Calculate statistics
-    total_users = User.query.count()
-    total_deposits = db.session.query(db.func.sum(DepositRequest.amount))\
-        .filter_by(status='approved').scalar() or 0
-    total_withdrawals = db.session.query(db.func.sum(WithdrawalRequest.amount))\
-        .filter_by(status='approved').scalar() or 0
-    total_games = Game.query.count()
-    
-    # Today's statistics
-    today = datetime.utcnow().date()
-    today_deposits = db.session.query(db.func.sum(DepositRequest.amount))\
-        .filter(DepositRequest.created_at >= today, DepositRequest.status == 'approved').scalar() or 0
-    today_withdrawals = db.session.query(db.func.sum(WithdrawalRequest.amount))\
-        .filter(WithdrawalRequest.created_at >= today, WithdrawalRequest.status == 'approved').scalar() or 0
+    # Counters are maintained incrementally, see utils/stats.py
+    platform_stats = stats.get_platform_stats()
     
-    # Pending requests
-    pending_deposits = DepositRequest.query.filter_by(status='pending').count()
-    pending_withdrawals = WithdrawalRequest.query.filter_by(status='pending').count()
-    
-    # Top referral users
-    top_referrers = User.query.order_by(User.referral_commission.desc()).limit(5).all()
+    # Top referral users, see utils/leaderboard.py
+    top_referrers = leaderboard.top(5)
     
     return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         total_deposits=total_deposits,
-                         total_withdrawals=total_withdrawals,
-                         total_games=total_games,
-                         today_deposits=today_deposits,
-                         today_withdrawals=today_withdrawals,
-                         pending_deposits=pending_deposits,
-                         pending_withdrawals=pending_withdrawals,
-                         top_referrers=top_referrers)
+                         top_referrers=top_referrers,
+                         **platform_stats)
+
+@bp.route('/stats.json')
+@admin_login_required
+@query_budget(1)
+def stats_json():
+    """Dashboard counters, polled by the dashboard every STATS_POLL_INTERVAL seconds.
+    
+    One primary-key read; unchanged counters revalidate to an empty 304. The
+    counters themselves are updated when a request is written, but the page
+    polls rather than being pushed to: a push channel (SSE, websockets) holds a
+    sync worker per open tab, which the shared-hosting deploy can't spare.
+    """
+    response = jsonify(stats.get_platform_stats())
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @bp.route('/users')
 @admin_login_required
+@query_budget(3)
 def users():
-    page = request.args.get('page', 1, type=int)
-    users = User.query.paginate(page=page, per_page=20, error_out=False)
+    users = keyset_paginate(User.query, User,
+                            cursor=request.args.get('cursor'),
+                            direction=request.args.get('dir', 'next'),
+                            total=approximate_count('users', User.query))
     return render_template('admin/users.html', users=users)
 
 @bp.route('/users/<int:user_id>/edit', methods=['GET', 'POST'])
@@ -84,18 +94,16 @@ def edit_user(user_id):
         action = request.form.get('action')
         
         if action == 'update_balance':
-            new_balance = float(request.form.get('balance', 0))
-            old_balance = user.balance
-            user.balance = new_balance
-            
-            # Create transaction record
-            transaction = Transaction(
-                user_id=user.id,
-                type='manual_adjustment',
-                amount=new_balance - old_balance,
-                description=f'Manual balance adjustment by admin'
-            )
-            db.session.add(transaction)
+            # Compare against the balance the form was rendered with, so a deposit approved
+            # while the admin was editing is not overwritten
+            try:
+                ledger.adjust_to(user.id, 'balance', int(request.form['expected_balance_minor']),
+                                 to_minor(request.form.get('balance', 0)),
+                                 'manual_adjustment', 'Manual balance adjustment by admin')
+            except (KeyError, ValueError, ledger.ConcurrentUpdate):
+                db.session.rollback()
+                flash('The balance changed since this page was loaded, reload it and try again', 'error')
+                return redirect(url_for('admin.edit_user', user_id=user_id))
             
         elif action == 'toggle_status':
             user.is_active = not user.is_active
@@ -103,19 +111,60 @@ def edit_user(user_id):
         elif action == 'reset_password':
             new_password = request.form.get('new_password')
             if new_password:
-                user.set_password(new_password)
+                try:
+                    user.set_password(new_password)
+                except HashingBusy:
+                    flash('The server is busy, please try again in a moment', 'error')
+                    return redirect(url_for('admin.edit_user', user_id=user_id))
         
         db.session.commit()
         flash('User updated successfully', 'success')
         return redirect(url_for('admin.users'))
     
-    return render_template('admin/edit_user.html', user=user)
+    recent_referrals = User.query.filter_by(referred_by=user.id)\
+        .order_by(User.created_at.desc(), User.id.desc()).limit(5).all()
+    return render_template('admin/edit_user.html', user=user, recent_referrals=recent_referrals)
+
+@bp.route('/users/<int:user_id>/referrals')
+@admin_login_required
+@query_budget(4)
+def user_referrals(user_id):
+    user = User.query.get_or_404(user_id)
+    referred_users = keyset_paginate(User.query.filter_by(referred_by=user.id), User,
+                                     cursor=request.args.get('cursor'),
+                                     direction=request.args.get('dir', 'next'),
+                                     total=user.referral_count)
+    levels = referrals.downline_levels(user.id, referrals.max_depth())
+    return render_template('admin/referrals.html', user=user, referred_users=referred_users, levels=levels)
+
+@bp.route('/users/<int:user_id>/referral-tree.json')
+@admin_login_required
+def referral_tree(user_id):
+    """Downline size and earnings per level (?depth=N, capped at REFERRAL_TREE_MAX_DEPTH) and the upline"""
+    user = User.query.get_or_404(user_id)
+    try:
+        depth = referrals.max_depth(request.args.get('depth'))
+    except ValueError:
+        return jsonify({'error': 'depth must be a number'}), 400
+    levels = referrals.downline_levels(user.id, depth)
+    return jsonify({
+        'user_id': user.id,
+        'depth': depth,
+        'direct_referrals': user.referral_count,
+        'downline_size': sum(level['users'] for level in levels),
+        'levels': levels,
+        'upline': [{'id': referrer_id, 'full_name': full_name, 'depth': level}
+                   for referrer_id, full_name, level in referrals.upline(user.id, depth)],
+    })
 
 @bp.route('/games')
 @admin_login_required
+@query_budget(2)
 def games():
-    games = Game.query.all()
-    return render_template('admin/games.html', games=games)
+    q = request.args.get('q', '').strip()
+    games = catalog.search(q, request.args.get('category') or None, request.args.get('sort', 'newest'),
+                           page=request.args.get('page', 1, type=int), per_page=50, active_only=False)
+    return render_template('admin/games.html', games=games, q=q)
 
 @bp.route('/games/add', methods=['GET', 'POST'])
 @admin_login_required
@@ -134,16 +183,12 @@ def add_game():
         if 'thumbnail' in request.files:
             file = request.files['thumbnail']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                thumbnail = f"game_thumb_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join('uploads', thumbnail))
+                thumbnail = storage.save_upload(file, 'thumbnail')
         
         if 'game_file' in request.files:
             file = request.files['game_file']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                game_file = f"game_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join('uploads', game_file))
+                game_file = storage.save_upload(file, 'game')
         
         game = Game(
             title=title,
@@ -156,7 +201,10 @@ def add_game():
         )
         
         db.session.add(game)
+        stats.record_game_added()
         db.session.commit()
+        catalog.add(game)
+        invalidate_public_pages()
         
         flash('Game added successfully', 'success')
         return redirect(url_for('admin.games'))
@@ -165,126 +213,158 @@ def add_game():
 
 @bp.route('/deposits')
 @admin_login_required
+@query_budget(3)
 def deposits():
     status_filter = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
     
     query = DepositRequest.query
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    deposits = query.order_by(DepositRequest.created_at.desc())\
-        .paginate(page=page, per_page=20, error_out=False)
+    # The table and the per-row modals only show the owner's name and phone
+    page_query = query.options(joinedload(DepositRequest.user).load_only(User.full_name, User.phone))
+    deposits = keyset_paginate(page_query, DepositRequest,
+                            cursor=request.args.get('cursor'),
+                            direction=request.args.get('dir', 'next'),
+                            total=approximate_count(('deposits', status_filter), query))
     
     return render_template('admin/deposits.html', deposits=deposits, status_filter=status_filter)
 
 @bp.route('/deposits/<int:deposit_id>/process', methods=['POST'])
 @admin_login_required
 def process_deposit(deposit_id):
-    deposit = DepositRequest.query.get_or_404(deposit_id)
     action = request.form.get('action')
-    admin_notes = request.form.get('admin_notes')
-    
-    if action == 'approve':
-        deposit.status = 'approved'
-        deposit.processed_at = datetime.utcnow()
-        deposit.admin_notes = admin_notes
-        
-        # Add amount to user balance
-        user = deposit.user
-        user.balance += deposit.amount
-        
-        # Add deposit bonus if configured
-        settings = SiteSettings.query.first()
-        if settings and settings.deposit_bonus_percentage > 0:
-            bonus = deposit.amount * (settings.deposit_bonus_percentage / 100)
-            user.bonus_balance += bonus
-            deposit.bonus_amount = bonus
-        
-        # Create transaction record
-        transaction = Transaction(
-            user_id=user.id,
-            type='deposit',
-            amount=deposit.amount,
-            description=f'Deposit approved - {deposit.payment_method}'
-        )
-        db.session.add(transaction)
-        
-        # Handle referral commission
-        if user.referred_by and settings:
-            commission_rate = settings.referral_commission_percentage / 100
-            commission = deposit.amount * commission_rate
-            referrer = User.query.get(user.referred_by)
-            if referrer:
-                referrer.referral_commission += commission
-                
-                # Create commission transaction
-                commission_transaction = Transaction(
-                    user_id=referrer.id,
-                    type='referral',
-                    amount=commission,
-                    description=f'Referral commission from {user.full_name}'
-                )
-                db.session.add(commission_transaction)
-        
-    elif action == 'reject':
-        deposit.status = 'rejected'
-        deposit.processed_at = datetime.utcnow()
-        deposit.admin_notes = admin_notes
+    if action not in payments.ACTIONS:
+        flash('Invalid action', 'error')
+        return redirect(url_for('admin.deposits'))
     
-    db.session.commit()
-    flash(f'Deposit {action}d successfully', 'success')
+    result = payments.process_deposits([deposit_id], action, request.form.get('admin_notes'))[deposit_id]
+    if result == 'not found':
+        abort(404)
+    if result == payments.ACTIONS[action]:
+        flash(f'Deposit {action}d successfully', 'success')
+    else:
+        flash(f'Deposit #{deposit_id} was not processed: {result}', 'error')
     return redirect(url_for('admin.deposits'))
 
+def _bulk_process(label, process, listing_endpoint):
+    """Shared handler for the bulk endpoints; accepts a form post or a JSON body"""
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('ids'), list) \
+                or not isinstance(data.get('admin_notes') or '', str):
+            return jsonify({'error': 'expected a JSON object with an action and a list of ids'}), 400
+        action, admin_notes, raw_ids = data.get('action'), data.get('admin_notes'), data['ids']
+    else:
+        action, admin_notes = request.form.get('action'), request.form.get('admin_notes')
+        raw_ids = request.form.getlist('ids')
+    try:
+        ids = [int(request_id) for request_id in raw_ids]
+    except (TypeError, ValueError):
+        ids = None
+    
+    if action not in payments.ACTIONS or not ids:
+        if request.is_json:
+            return jsonify({'error': 'action and a list of ids are required'}), 400
+        flash(f'Select at least one {label.lower()} request', 'error')
+        return redirect(url_for(listing_endpoint, status='pending'))
+    
+    results = process(ids, action, admin_notes)
+    if request.is_json:
+        return jsonify({'results': {str(request_id): result for request_id, result in results.items()}})
+    
+    status = payments.ACTIONS[action]
+    processed = [request_id for request_id, result in results.items() if result == status]
+    skipped = [f'#{request_id}: {result}' for request_id, result in results.items() if result != status]
+    if processed:
+        flash(f'{label} requests {status}: {len(processed)}', 'success')
+    if skipped:
+        flash(f'Skipped {len(skipped)} - ' + ', '.join(skipped), 'error')
+    return redirect(url_for(listing_endpoint, status='pending'))
+
+@bp.route('/deposits/bulk', methods=['POST'])
+@admin_login_required
+def bulk_process_deposits():
+    return _bulk_process('Deposit', payments.process_deposits, 'admin.deposits')
+
 @bp.route('/withdrawals')
 @admin_login_required
+@query_budget(3)
 def withdrawals():
     status_filter = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
     
     query = WithdrawalRequest.query
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    withdrawals = query.order_by(WithdrawalRequest.created_at.desc())\
-        .paginate(page=page, per_page=20, error_out=False)
+    page_query = query.options(
+        joinedload(WithdrawalRequest.user).load_only(User.full_name, User.phone, User.balance_minor))
+    withdrawals = keyset_paginate(page_query, WithdrawalRequest,
+                            cursor=request.args.get('cursor'),
+                            direction=request.args.get('dir', 'next'),
+                            total=approximate_count(('withdrawals', status_filter), query))
     
     return render_template('admin/withdrawals.html', withdrawals=withdrawals, status_filter=status_filter)
 
 @bp.route('/withdrawals/<int:withdrawal_id>/process', methods=['POST'])
 @admin_login_required
 def process_withdrawal(withdrawal_id):
-    withdrawal = WithdrawalRequest.query.get_or_404(withdrawal_id)
     action = request.form.get('action')
-    admin_notes = request.form.get('admin_notes')
+    if action not in payments.ACTIONS:
+        flash('Invalid action', 'error')
+        return redirect(url_for('admin.withdrawals'))
     
-    if action == 'approve':
-        withdrawal.status = 'approved'
-        withdrawal.processed_at = datetime.utcnow()
-        withdrawal.admin_notes = admin_notes
-        
-        # Deduct amount from user balance
-        user = withdrawal.user
-        user.balance -= withdrawal.amount
-        
-        # Create transaction record
-        transaction = Transaction(
-            user_id=user.id,
-            type='withdrawal',
-            amount=-withdrawal.amount,
-            description=f'Withdrawal approved - {withdrawal.payment_method}'
-        )
-        db.session.add(transaction)
-        
-    elif action == 'reject':
-        withdrawal.status = 'rejected'
-        withdrawal.processed_at = datetime.utcnow()
-        withdrawal.admin_notes = admin_notes
-    
-    db.session.commit()
-    flash(f'Withdrawal {action}d successfully', 'success')
+    result = payments.process_withdrawals([withdrawal_id], action, request.form.get('admin_notes'))[withdrawal_id]
+    if result == 'not found':
+        abort(404)
+    if result == payments.ACTIONS[action]:
+        flash(f'Withdrawal {action}d successfully', 'success')
+    else:
+        flash(f'Withdrawal #{withdrawal_id} was not processed: {result}', 'error')
     return redirect(url_for('admin.withdrawals'))
 
+@bp.route('/withdrawals/bulk', methods=['POST'])
+@admin_login_required
+def bulk_process_withdrawals():
+    return _bulk_process('Withdrawal', payments.process_withdrawals, 'admin.withdrawals')
+
+@bp.route('/reports')
+@admin_login_required
+@query_budget(3)
+def reports():
+    """Per-day and per-payment-method totals, read from the daily rollups (see utils/rollups.py)"""
+    today = datetime.utcnow().date()
+    try:
+        until = exports.parse_day(request.args.get('until')) or today
+        since = exports.parse_day(request.args.get('since')) or until - timedelta(days=29)
+    except ValueError:
+        flash('Dates must look like 2025-01-31', 'error')
+        return redirect(url_for('admin.reports'))
+    if since > until:
+        since, until = until, since
+    
+    return render_template('admin/reports.html', since=since, until=until,
+                           report=rollups.report(since, until))
+
+@bp.route('/export/<kind>')
+@admin_login_required
+def export(kind):
+    """Stream a CSV or NDJSON dump; filters: since/until (YYYY-MM-DD, inclusive), status, gzip=1"""
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    try:
+        since = exports.parse_day(request.args.get('since'))
+        until = exports.parse_day(request.args.get('until'))
+        body = exports.generate(kind, fmt, since, until, request.args.get('status') or None, compress)
+    except ValueError as error:
+        abort(400, str(error))
+    
+    name = exports.filename(kind, fmt, since, until, compress)
+    return Response(stream_with_context(body),
+                    mimetype='application/gzip' if compress else exports.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{name}"',
+                             'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
 @bp.route('/settings', methods=['GET', 'POST'])
 @admin_login_required
 def settings():
@@ -293,6 +373,7 @@ def settings():
         settings = SiteSettings()
         db.session.add(settings)
         db.session.commit()
+        invalidate_site_settings()
     
     if request.method == 'POST':
         settings.site_name = request.form.get('site_name')
@@ -308,6 +389,8 @@ def settings():
         settings.maintenance_mode = 'maintenance_mode' in request.form
         
         db.session.commit()
+        invalidate_site_settings()
+        invalidate_public_pages()
         flash('Settings updated successfully', 'success')
         return redirect(url_for('admin.settings'))
     
@@ -335,9 +418,7 @@ def add_slider():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                image_path = f"slider_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join('uploads', image_path))
+                image_path = storage.save_upload(file, 'slider')
         
         if image_path:
             slider = HomepageSlider(
@@ -349,6 +430,7 @@ def add_slider():
             
             db.session.add(slider)
             db.session.commit()
+            invalidate_public_pages()
             
             flash('Slider added successfully', 'success')
             return redirect(url_for('admin.sliders'))
@@ -0,0 +1,33 @@
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_file, abort
+from werkzeug.security import safe_join
+from utils.assets import dist_folder, MANIFEST
+
+bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+ONE_YEAR = 365 * 24 * 3600
+# Preferred first when the client accepts both
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+@bp.route('/<path:filename>')
+def serve(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it, cached for a year"""
+    path = safe_join(dist_folder(current_app), filename)
+    if path is None or filename == MANIFEST or filename.endswith(('.gz', '.br')) or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         conditional=True, max_age=ONE_YEAR)
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from models import User, SiteSettings
+from models import User
 from app import db
-from utils.helpers import login_required
+from utils.helpers import login_required, get_site_settings, login_user, logout_user
+from utils import stats, referrals
+from utils.passwords import HashingBusy
+from utils.ledger import to_minor
 from datetime import datetime
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -28,28 +31,31 @@ def register():
             flash('Phone number already registered', 'error')
             return render_template('auth/register.html')
         
-        # Create user
+        # Create user, with the signup bonus if one is configured
+        settings = get_site_settings()
+        signup_bonus = settings.signup_bonus if settings and settings.signup_bonus > 0 else 0
         user = User(
             full_name=full_name,
-            phone=phone
+            phone=phone,
+            bonus_balance_minor=to_minor(signup_bonus)
         )
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except HashingBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('auth/register.html'), 503, {'Retry-After': '1'}
         
         # Handle referral
         if referral_code:
             referrer = User.query.filter_by(referral_code=referral_code).first()
             if referrer:
                 user.referred_by = referrer.id
+                referrals.add_referral(referrer.id)
         
         db.session.add(user)
+        stats.record_user_registered()
         db.session.commit()
         
-        # Add signup bonus
-        settings = SiteSettings.query.first()
-        if settings and settings.signup_bonus > 0:
-            user.bonus_balance += settings.signup_bonus
-            db.session.commit()
-        
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('auth.login'))
     
@@ -71,8 +77,14 @@ def login():
             (User.username == phone_or_username)
         ).first()
         
-        if user and user.check_password(password) and user.is_active:
-            session['user_id'] = user.id
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except HashingBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('auth/login.html'), 503, {'Retry-After': '1'}
+        
+        if authenticated and user.is_active:
+            login_user(user)
             user.last_login = datetime.utcnow()
             db.session.commit()
             flash('Login successful!', 'success')
@@ -84,6 +96,6 @@ def login():
 
 @bp.route('/logout')
 def logout():
-    session.pop('user_id', None)
+    logout_user()
     flash('Logged out successfully', 'success')
     return redirect(url_for('main.index'))
@@ -1,9 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from models import HomepageSlider, SiteSettings, Game
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from models import HomepageSlider, Game
+from utils.helpers import get_site_settings
+from utils.cache import PageCache
+from utils import leaderboard
+from utils.catalog import catalog, SORTS, DEFAULT_SORT
 
 bp = Blueprint('main', __name__)
 
+# Homepage and catalog change only when an admin edits games, sliders or settings
+public_pages = PageCache('public_pages', ttl=60)
+
+def invalidate_public_pages():
+    public_pages.invalidate()
+
 @bp.route('/')
+@public_pages.cached
 def index():
     # Get active sliders
     sliders = HomepageSlider.query.filter_by(is_active=True)\
@@ -13,7 +24,7 @@ def index():
     featured_games = Game.query.filter_by(is_active=True).limit(8).all()
     
     # Get site settings
-    settings = SiteSettings.query.first()
+    settings = get_site_settings()
     
     return render_template('index.html', 
                          sliders=sliders, 
@@ -21,15 +32,37 @@ def index():
                          settings=settings)
 
 @bp.route('/games')
+@public_pages.cached
 def games():
+    # Served from the per-worker index, see utils/catalog.py
     category = request.args.get('category', 'all')
-    
-    if category == 'all':
-        games = Game.query.filter_by(is_active=True).all()
-    else:
-        games = Game.query.filter_by(is_active=True, category=category).all()
-    
-    return render_template('games.html', games=games, category=category)
+    q = request.args.get('q', '').strip()
+    sort = request.args.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    games = catalog.search(q, None if category == 'all' else category, sort,
+                           page=request.args.get('page', 1, type=int),
+                           per_page=request.args.get('per_page', 24, type=int))
+    return render_template('games.html', games=games, category=category, q=q, sort=sort)
+
+@bp.route('/games/search.json')
+def search_games():
+    """Type-ahead suggestions: [{id, title, category, url}]"""
+    category = request.args.get('category', 'all')
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    cards = catalog.suggest(request.args.get('q', ''), None if category == 'all' else category, limit)
+    response = jsonify([{'id': card.id, 'title': card.title, 'category': card.category,
+                         'url': url_for('main.play_game', game_id=card.id)} for card in cards])
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response
+
+@bp.route('/leaderboard', endpoint='leaderboard')
+def leaderboard_page():
+    # Served from the per-worker board, see utils/leaderboard.py
+    user_id = session.get('user_id')
+    return render_template('leaderboard.html', entries=leaderboard.top(20),
+                           my_rank=leaderboard.rank(user_id) if user_id else None)
 
 @bp.route('/games/<int:game_id>')
 def play_game(game_id):
@@ -0,0 +1,19 @@
+import hmac
+from flask import Blueprint, current_app, request, session, abort, Response
+from utils import metrics
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics')
+def export():
+    """Prometheus scrape endpoint, for logged-in admins or a bearer token matching METRICS_TOKEN"""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    authorized = token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not authorized and 'admin_id' not in session:
+        abort(404)
+    directory = metrics.metrics_dir(current_app)
+    metrics.flush(directory, force=True)
+    return Response(metrics.render(metrics.collect(directory)),
+                    content_type='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import re
+from flask import Blueprint, current_app, request, send_file, abort, make_response, session
+from werkzeug.security import safe_join
+
+bp = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+# Files named after a hex digest of their content never change, so browsers may keep them forever
+CONTENT_NAME = re.compile(r'(?:^|[_.-])([0-9a-f]{16,64})(?:[_.-]|$)')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Payment screenshots are only for the admins reviewing deposits
+PRIVATE_PREFIXES = ('deposit_',)
+
+def upload_root():
+    return os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+
+@bp.route('/<path:filename>')
+def serve(filename):
+    """Serve an uploaded file with ETag, Range and long-lived caching.
+
+    With UPLOADS_OFFLOAD = 'nginx' (X-Accel-Redirect to UPLOADS_ACCEL_PREFIX) or
+    'sendfile' (X-Sendfile with the absolute path) the web server sends the bytes
+    and handles Range itself; this view only checks access and sets headers.
+    """
+    path = safe_join(upload_root(), filename)
+    if path is None or filename.startswith('.') or not os.path.isfile(path):
+        abort(404)
+    private = os.path.basename(filename).startswith(PRIVATE_PREFIXES)
+    if private and 'admin_id' not in session:
+        abort(404)
+
+    digest = CONTENT_NAME.search(os.path.basename(filename))
+    stat = os.stat(path)
+    etag = digest.group(1) if digest else f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    offload = current_app.config.get('UPLOADS_OFFLOAD')
+    if offload:
+        response = _offload_response(path, filename, stat, etag, offload)
+    else:
+        response = send_file(path, conditional=True, etag=etag)
+
+    response.cache_control.no_cache = None
+    if digest:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = current_app.config.get('UPLOADS_MAX_AGE', 3600)
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    return response
+
+def _offload_response(path, filename, stat, etag, offload):
+    response = make_response('')
+    response.content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response.last_modified = int(stat.st_mtime)
+    response.set_etag(etag)
+    if offload == 'nginx':
+        prefix = current_app.config.get('UPLOADS_ACCEL_PREFIX', '/_uploads/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + filename
+    elif offload == 'sendfile':
+        response.headers['X-Sendfile'] = path
+    else:
+        raise ValueError(f'Unknown UPLOADS_OFFLOAD {offload!r}')
+    # Answer revalidations here so the server never opens the file for a 304
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        response.headers.pop('X-Accel-Redirect', None)
+        response.headers.pop('X-Sendfile', None)
+    return response
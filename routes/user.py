@@ -2,9 +2,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from models import User, DepositRequest, WithdrawalRequest, PaymentMethod, Transaction, SiteSettings
 from app import db
 from utils.helpers import login_required, get_current_user
-from datetime import datetime
-import os
-from werkzeug.utils import secure_filename
+from utils import stats, storage
+from utils.passwords import HashingBusy
+from utils.pagination import keyset_paginate
+from sqlalchemy.orm import load_only
 
 bp = Blueprint('user', __name__, url_prefix='/user')
 
@@ -15,13 +16,21 @@ def dashboard():
     recent_transactions = Transaction.query.filter_by(user_id=user.id)\
         .order_by(Transaction.created_at.desc()).limit(10).all()
     
-    # Calculate referral earnings
-    referred_users = User.query.filter_by(referred_by=user.id).all()
-    
+    # The referral total comes from user.referral_count, see utils/referrals.py
     return render_template('user/dashboard.html', 
                          user=user, 
-                         transactions=recent_transactions,
-                         referred_users=referred_users)
+                         transactions=recent_transactions)
+
+@bp.route('/referrals')
+@login_required
+def referrals():
+    user = get_current_user()
+    referred_users = keyset_paginate(
+        User.query.filter_by(referred_by=user.id).options(load_only(User.full_name, User.created_at)), User,
+        cursor=request.args.get('cursor'),
+        direction=request.args.get('dir', 'next'),
+        total=user.referral_count)
+    return render_template('user/referrals.html', user=user, referred_users=referred_users)
 
 @bp.route('/deposit', methods=['GET', 'POST'])
 @login_required
@@ -40,12 +49,10 @@ def deposit():
         if 'screenshot' in request.files:
             file = request.files['screenshot']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                screenshot = f"deposit_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-                file.save(os.path.join('uploads', screenshot))
+                screenshot = storage.save_upload(file, 'deposit')
         
         deposit_request = DepositRequest(
-            user_id=get_current_user().id,
+            user_id=session['user_id'],
             amount=amount,
             payment_method=payment_method,
             transaction_id=transaction_id,
@@ -53,6 +60,7 @@ def deposit():
         )
         
         db.session.add(deposit_request)
+        stats.record_deposit_submitted()
         db.session.commit()
         
         flash('Deposit request submitted successfully', 'success')
@@ -87,6 +95,7 @@ def withdraw():
         )
         
         db.session.add(withdrawal_request)
+        stats.record_withdrawal_submitted()
         db.session.commit()
         
         flash('Withdrawal request submitted successfully', 'success')
@@ -108,14 +117,19 @@ def profile():
             new_password = request.form.get('new_password')
             confirm_password = request.form.get('confirm_password')
             
-            if not user.check_password(current_password):
-                flash('Current password is incorrect', 'error')
-            elif new_password != confirm_password:
-                flash('New passwords do not match', 'error')
-            else:
-                user.set_password(new_password)
-                db.session.commit()
-                flash('Password changed successfully', 'success')
+            try:
+                if not user.check_password(current_password):
+                    flash('Current password is incorrect', 'error')
+                elif new_password != confirm_password:
+                    flash('New passwords do not match', 'error')
+                else:
+                    user.set_password(new_password)
+                    db.session.commit()
+                    flash('Password changed successfully', 'success')
+            except HashingBusy:
+                db.session.rollback()
+                flash('The server is busy, please try again in a moment', 'error')
+                return render_template('user/profile.html', user=user), 503, {'Retry-After': '1'}
         
         elif 'update_profile' in request.form:
             username = request.form.get('username')
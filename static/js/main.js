@@ -155,30 +155,41 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Auto-refresh for admin dashboard
-    if (window.location.pathname.includes('/admin/dashboard')) {
-        setInterval(function() {
-            // Refresh only the stats without full page reload
-            fetch(window.location.href)
-                .then(response => response.text())
-                .then(html => {
-                    var parser = new DOMParser();
-                    var doc = parser.parseFromString(html, 'text/html');
-                    
-                    // Update stat cards
-                    var statCards = document.querySelectorAll('.card .h5');
-                    var newStatCards = doc.querySelectorAll('.card .h5');
-                    
-                    statCards.forEach(function(card, index) {
-                        if (newStatCards[index]) {
-                            card.textContent = newStatCards[index].textContent;
-                        }
-                    });
-                })
+    // Live stats for admin dashboard
+    var dashboardStats = document.getElementById('dashboard-stats');
+    if (dashboardStats) {
+        var applyStats = function(stats) {
+            Object.keys(stats).forEach(function(name) {
+                document.querySelectorAll('[data-stat="' + name + '"]').forEach(function(el) {
+                    el.textContent = el.dataset.format === 'money' ?
+                        '$' + Number(stats[name]).toFixed(2) : stats[name];
+                });
+            });
+        };
+        
+        // Short polls of stats.json: unchanged counters come back as a 304, and hidden tabs don't poll
+        var pollInterval = Number(dashboardStats.dataset.pollInterval || 10) * 1000;
+        var refreshStats = function() {
+            if (document.hidden) return;
+            fetch(dashboardStats.dataset.jsonUrl, {cache: 'no-cache'})
+                .then(response => response.json())
+                .then(applyStats)
                 .catch(error => console.log('Auto-refresh failed:', error));
-        }, 30000); // Refresh every 30 seconds
+        };
+        setInterval(refreshStats, pollInterval);
+        document.addEventListener('visibilitychange', refreshStats);
     }
     
+    // Select-all checkbox for bulk actions
+    document.querySelectorAll('[data-select-all]').forEach(function(toggle) {
+        toggle.addEventListener('change', function() {
+            var formId = this.dataset.selectAll;
+            document.querySelectorAll('input[name="ids"][form="' + formId + '"]').forEach(function(box) {
+                box.checked = toggle.checked;
+            });
+        });
+    });
+    
     // Confirm dialogs for destructive actions
     var dangerButtons = document.querySelectorAll('.btn-danger, .btn-outline-danger');
     dangerButtons.forEach(function(button) {
@@ -0,0 +1,43 @@
+"""Shared fixtures: one bootstrapped, seeded SQLite database for the whole run.
+
+The app's per-worker caches are module globals, so every test uses the same
+app and database instead of building a fresh one per test.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from app import create_app, db
+    from utils.migrations import bootstrap
+    from seed import seed
+
+    folder = tmp_path_factory.mktemp('app')
+    app = create_app({'TESTING': True, 'LOG_LEVEL': 'WARNING',
+                      'SQLALCHEMY_DATABASE_URI': f"sqlite:///{folder / 'test.db'}",
+                      'UPLOAD_FOLDER': str(folder / 'uploads')})
+    # Generation stamps and metrics go here instead of the repo's instance folder
+    app.instance_path = str(folder / 'instance')
+    with app.app_context():
+        bootstrap()
+        seed(db, users=60, games=30, sliders=3, transactions=20000, deposits=60, withdrawals=40,
+             pending_rate=0.5)
+    return app
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    response = client.post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+def test_stats_json_revalidates_to_304(admin_client):
+    first = admin_client.get('/admin/stats.json')
+    assert first.status_code == 200
+    assert {'total_users', 'pending_deposits'} <= set(first.get_json())
+    again = admin_client.get('/admin/stats.json', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    'approve',
+    None,
+    {'action': 'approve', 'ids': '12'},
+    {'action': 'approve', 'ids': {'1': 1}},
+    {'action': 'approve', 'ids': 5},
+    {'action': 'approve', 'ids': ['x']},
+    {'action': 'approve', 'ids': []},
+    {'action': 'approve', 'ids': [1], 'admin_notes': ['not', 'text']},
+    {'action': 'steal', 'ids': [1]},
+])
+@pytest.mark.parametrize('kind', ['deposits', 'withdrawals'])
+def test_bulk_rejects_malformed_json(admin_client, kind, body):
+    response = admin_client.post(f'/admin/{kind}/bulk', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+@pytest.mark.parametrize('kind', ['deposits', 'withdrawals'])
+def test_bulk_reports_unknown_ids(admin_client, kind):
+    response = admin_client.post(f'/admin/{kind}/bulk', json={'action': 'reject', 'ids': [999999]})
+    assert response.status_code == 200
+    assert list(response.get_json()['results']) == ['999999']
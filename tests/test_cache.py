@@ -0,0 +1,53 @@
+import time
+
+from utils.cache import CachedValue, PageCache
+from utils.helpers import _load_site_settings
+
+def test_settings_update_reaches_other_worker_within_check_interval(app, app_context):
+    from app import db
+    from models import SiteSettings
+
+    db.session.add(SiteSettings(site_name='Before'))
+    db.session.commit()
+    # Two workers' copies of the settings cache, sharing one stamp file in the instance folder
+    worker_a = CachedValue('site_settings', _load_site_settings)
+    worker_b = CachedValue('site_settings', _load_site_settings)
+    assert worker_a.get().site_name == worker_b.get().site_name == 'Before'
+
+    settings = SiteSettings.query.first()
+    settings.site_name = 'After'
+    db.session.commit()
+    worker_a.invalidate()
+    changed_at = time.monotonic()
+    assert worker_a.get().site_name == 'After'
+
+    deadline = changed_at + worker_b.stamp.check_interval + 0.25
+    while worker_b.get().site_name != 'After':
+        assert time.monotonic() < deadline, 'settings change did not reach the other worker in time'
+        time.sleep(0.02)
+
+def test_page_cache_evicts_least_recently_used(app_context):
+    pages = PageCache('test_lru_pages', max_entries=2)
+    pages.set('a', 'page a')
+    pages.set('b', 'page b')
+    assert pages.get('a')[0] == 'page a'
+    pages.set('c', 'page c')
+    assert pages.get('b') is None
+    assert pages.get('a')[0] == 'page a'
+    assert pages.get('c')[0] == 'page c'
+
+def test_logged_in_pages_are_not_cached(app):
+    anonymous = app.test_client()
+    first = anonymous.get('/')
+    assert first.status_code == 200
+    assert first.headers['ETag'] and 'public' in first.headers['Cache-Control']
+    assert anonymous.get('/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    player = app.test_client()
+    response = player.post('/auth/login', data={'phone_or_username': 'player1', 'password': 'password'})
+    assert response.status_code == 302
+    player.get(response.headers['Location'])  # consume the welcome flash
+    response = player.get('/')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'public' not in response.headers.get('Cache-Control', '')
@@ -0,0 +1,38 @@
+import gzip
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from utils.compression import CompressionMiddleware
+
+def _client(body, mimetype='text/html', vary=None):
+    def app(environ, start_response):
+        response = Response(body, mimetype=mimetype)
+        if vary:
+            response.headers['Vary'] = vary
+        return response(environ, start_response)
+    return Client(CompressionMiddleware(app, min_size=1024))
+
+@pytest.mark.parametrize('size', [10, 4096])
+@pytest.mark.parametrize('accept_encoding', [None, 'identity', 'gzip'])
+def test_compressible_responses_always_vary_on_accept_encoding(size, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = _client(b'x' * size).get('/', headers=headers)
+    assert response.headers.get_all('Vary') == ['Accept-Encoding']
+    compressed = accept_encoding == 'gzip' and size >= 1024
+    assert response.headers.get('Content-Encoding') == ('gzip' if compressed else None)
+    body = gzip.decompress(response.data) if compressed else response.data
+    assert body == b'x' * size
+
+def test_existing_vary_is_kept_once():
+    client = _client(b'x' * 4096, vary='Cookie, accept-encoding')
+    assert client.get('/').headers['Vary'] == 'Cookie, accept-encoding'
+    assert client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['Vary'] == 'Cookie, accept-encoding'
+    client = _client(b'x' * 4096, vary='Cookie')
+    assert client.get('/').headers['Vary'] == 'Cookie, Accept-Encoding'
+
+def test_incompressible_types_do_not_vary():
+    response = _client(b'x' * 4096, mimetype='image/png').get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Vary' not in response.headers
+    assert 'Content-Encoding' not in response.headers
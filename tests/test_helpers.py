@@ -0,0 +1,15 @@
+from flask import session
+from sqlalchemy import inspect
+
+from models import User
+from utils.helpers import get_current_user
+
+def test_current_user_leaves_the_password_hash_unloaded(app):
+    with app.test_request_context('/user/dashboard'):
+        session['user_id'] = 3
+        user = get_current_user()
+        assert user.id == 3 and user.full_name and user.balance_minor is not None
+        columns = {column.key for column in User.__table__.columns}
+        assert inspect(user).unloaded & columns == {'password_hash'}
+        assert get_current_user() is user
+        assert user.check_password('password')  # loaded on demand
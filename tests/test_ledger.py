@@ -0,0 +1,60 @@
+import re
+from decimal import Decimal
+
+from models import DepositRequest, Transaction, User
+from utils import ledger, payments, stats
+
+def _deposit_rows(user_id):
+    return Transaction.query.filter_by(user_id=user_id, type='deposit').count()
+
+def test_racing_approvals_credit_a_deposit_once(app, app_context, monkeypatch):
+    from app import db
+    user = db.session.get(User, 7)
+    deposit = DepositRequest(user_id=user.id, amount=12.34, payment_method='bKash')
+    db.session.add(deposit)
+    stats.record_deposit_submitted()
+    db.session.commit()
+    deposit_id, balance_before, rows_before = deposit.id, user.balance_minor, _deposit_rows(user.id)
+    stats_before = stats.get_platform_stats()
+
+    load_pending = payments._load_pending
+    def approve_elsewhere_after_loading(model, ids):
+        monkeypatch.setattr(payments, '_load_pending', load_pending)
+        loaded = load_pending(model, ids)
+        # Another worker, with its own session, approves the same deposit in between
+        with app.app_context():
+            assert payments.process_deposits([deposit_id], 'approve') == {deposit_id: 'approved'}
+        return loaded
+    monkeypatch.setattr(payments, '_load_pending', approve_elsewhere_after_loading)
+
+    assert payments.process_deposits([deposit_id], 'approve') == {deposit_id: ledger.AlreadyProcessed.reason}
+    assert payments.process_deposits([deposit_id], 'approve') == {deposit_id: 'already approved'}
+
+    db.session.expire_all()
+    assert db.session.get(User, user.id).balance_minor == balance_before + 1234
+    assert _deposit_rows(user.id) == rows_before + 1
+    stats_after = stats.get_platform_stats()
+    assert stats_after['total_deposits'] - stats_before['total_deposits'] == Decimal('12.34')
+    assert stats_after['pending_deposits'] == stats_before['pending_deposits'] - 1
+    assert stats_after == stats.compute_platform_stats()
+
+def test_balance_edit_from_a_stale_form_is_refused(app, admin_client):
+    from app import db
+    page = admin_client.get('/admin/users/8/edit').get_data(as_text=True)
+    expected = re.search(r'name="expected_balance_minor" value="(\d+)"', page).group(1)
+
+    with app.app_context():
+        # A deposit approved while the admin has the form open
+        ledger.post([ledger.Posting(8, 'balance', 500, 'deposit', 'approved meanwhile')])
+        db.session.commit()
+
+    form = {'action': 'update_balance', 'expected_balance_minor': expected, 'balance': '1.00'}
+    response = admin_client.post('/admin/users/8/edit', data=form, follow_redirects=True)
+    assert 'reload it and try again' in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(User, 8).balance_minor == int(expected) + 500
+
+    form['expected_balance_minor'] = str(int(expected) + 500)
+    assert admin_client.post('/admin/users/8/edit', data=form).status_code == 302
+    with app.app_context():
+        assert db.session.get(User, 8).balance_minor == 100
@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, inspect, select, text
+
+from utils.migrations import listing_created_at, money_minor_units
+from utils.pagination import decode_cursor, encode_cursor
+
+def test_money_minor_units_rebuilds_legacy_sqlite_transactions(app_context):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE user (id INTEGER PRIMARY KEY, balance FLOAT, '
+                                'bonus_balance FLOAT, referral_commission FLOAT)'))
+        connection.execute(text('CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, '
+                                'user_id INTEGER NOT NULL REFERENCES user (id), type VARCHAR(20) NOT NULL, '
+                                'amount FLOAT NOT NULL, description VARCHAR(200), created_at DATETIME)'))
+        connection.execute(text('CREATE INDEX ix_transaction_user_created ON "transaction" (user_id, created_at)'))
+        connection.execute(text("INSERT INTO user VALUES (1, 10.1, 0.2, 0.3)"))
+        connection.execute(text("INSERT INTO \"transaction\" VALUES (1, 1, 'deposit', 10.1, 'x', NULL)"))
+
+        money_minor_units(connection)
+
+        assert connection.execute(text('SELECT balance_minor, bonus_balance_minor, referral_commission_minor '
+                                       'FROM user')).one() == (1010, 20, 30)
+        assert connection.execute(text('SELECT id, amount_minor FROM "transaction"')).one() == (1, 1010)
+        inspector = inspect(connection)
+        assert 'amount' not in {column['name'] for column in inspector.get_columns('transaction')}
+        assert 'ix_transaction_user_created' in {index['name'] for index in inspector.get_indexes('transaction')}
+        assert inspector.get_foreign_keys('transaction')[0]['referred_table'] == 'user'
+
+def test_listing_created_at_backfills_missing_times(app_context):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE user (id INTEGER PRIMARY KEY, created_at DATETIME)'))
+        for table in ('deposit_request', 'withdrawal_request'):
+            connection.execute(text(f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, created_at DATETIME, '
+                                    f'processed_at DATETIME)'))
+            connection.execute(text(f"INSERT INTO {table} VALUES (1, '2025-03-01 10:00:00.000000', NULL), "
+                                    f"(2, NULL, '2025-04-02 09:30:00.000000'), (3, NULL, NULL)"))
+        connection.execute(text("INSERT INTO user VALUES (1, NULL), (2, '2025-02-01 08:00:00.000000')"))
+
+        listing_created_at(connection)
+
+        from models import DepositRequest, User
+        users = connection.execute(select(User.id, User.created_at).order_by(User.id)).all()
+        assert [str(row.created_at) for row in users] == ['2025-02-01 08:00:00'] * 2
+        deposits = connection.execute(select(DepositRequest.id, DepositRequest.created_at)
+                                      .order_by(DepositRequest.id)).all()
+        assert [str(row.created_at) for row in deposits] == \
+            ['2025-03-01 10:00:00', '2025-04-02 09:30:00', '2025-03-01 10:00:00']
+        assert connection.execute(text('SELECT COUNT(*) FROM withdrawal_request WHERE created_at IS NULL')).scalar() == 0
+        for row in users + deposits:
+            assert decode_cursor(encode_cursor(row)) == (row.created_at, row.id)
+
+def test_hot_queries_use_indexes(app, app_context):
+    from app import db
+    from utils.migrations import explain_full_scans
+    with db.engine.connect() as connection:
+        connection.execute(text('ANALYZE'))
+        assert explain_full_scans(connection) == {}
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.query_counter import QueryBudgetExceeded, assert_max_queries
+
+TODAY = datetime.utcnow().date()
+BUDGETED_PAGES = [
+    '/admin/stats.json',
+    '/admin/users',
+    '/admin/users/1/referrals',
+    '/admin/games',
+    '/admin/games?q=spins',
+    '/admin/deposits',
+    '/admin/deposits?status=pending',
+    '/admin/withdrawals',
+    '/admin/withdrawals?status=pending',
+    '/admin/reports',
+    # A year of daily rollups, not just the default 30 days
+    f'/admin/reports?since={TODAY - timedelta(days=365)}&until={TODAY}',
+]
+
+@pytest.fixture
+def enforced(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'ENFORCE_QUERY_BUDGETS', True)
+
+def test_seeded_rows_cover_more_than_one_page(app, app_context):
+    from models import DepositRequest, WithdrawalRequest, User
+    assert DepositRequest.query.count() >= 20
+    assert WithdrawalRequest.query.count() >= 20
+    assert User.query.count() >= 20
+
+@pytest.mark.parametrize('url', BUDGETED_PAGES)
+def test_admin_page_stays_within_query_budget(enforced, admin_client, url):
+    # With ENFORCE_QUERY_BUDGETS the decorator raises QueryBudgetExceeded, which TESTING propagates
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    if 'since=' in url:
+        assert str(TODAY - timedelta(days=365)) in response.get_data(as_text=True)
+
+def test_budget_violation_raises(app, app_context):
+    from app import db
+    from models import User
+    with pytest.raises(QueryBudgetExceeded):
+        with assert_max_queries(1):
+            db.session.get(User, 1)
+            db.session.expire_all()
+            User.query.filter_by(id=2).first()
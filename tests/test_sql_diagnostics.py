@@ -0,0 +1,33 @@
+import pytest
+
+from utils import sql_diagnostics
+
+@pytest.fixture
+def diagnostics_app(app, tmp_path):
+    from app import create_app
+    other = create_app({'TESTING': True, 'LOG_LEVEL': 'WARNING', 'SQL_DIAGNOSTICS': True, 'SLOW_QUERY_MS': 0,
+                        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                        'UPLOAD_FOLDER': app.config['UPLOAD_FOLDER']})
+    other.instance_path = str(tmp_path)
+    yield other
+    sql_diagnostics._summary.clear()
+
+def test_diagnostics_stay_with_the_app_that_enabled_them(app, diagnostics_app):
+    response = diagnostics_app.test_client().post('/admin/login', data={'username': 'admin', 'password': 'admin'})
+    assert response.status_code == 302
+    assert response.headers['X-SQL-Report'].startswith('queries=')
+    # SLOW_QUERY_MS=0 logs every statement; the origin is app code, not the shared hook
+    origins = {entry['origin'] for entry in sql_diagnostics._summary.values()}
+    assert origins and not any(origin.startswith(('utils/sql_events.py', 'utils/sql_diagnostics.py'))
+                               for origin in origins)
+
+    # The test app, created without SQL_DIAGNOSTICS, doesn't inherit them
+    sql_diagnostics._summary.clear()
+    response = app.test_client().get('/games?q=other')
+    assert response.status_code == 200
+    assert 'X-SQL-Report' not in response.headers
+    with app.app_context():
+        from app import db
+        from models import User
+        assert db.session.get(User, 1) is not None
+    assert sql_diagnostics._summary == {}
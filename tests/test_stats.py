@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+
+from utils import payments, stats
+from utils.migrations import platform_stats_minor_units
+
+def test_recorded_money_totals_match_a_rebuild_exactly(app, app_context):
+    from app import db
+    from models import DepositRequest, PlatformStats
+    stats.get_platform_stats()
+    # Amounts whose float sums drift: 0.1 + 0.2 != 0.3
+    deposits = [DepositRequest(user_id=1, amount=amount, payment_method='bKash')
+                for amount in [0.1, 0.2, 19.99, 0.7] * 5]
+    db.session.add_all(deposits)
+    for _ in deposits:
+        stats.record_deposit_submitted()
+    db.session.commit()
+    payments.process_deposits([deposit.id for deposit in deposits], 'approve')
+
+    stored = stats.get_platform_stats()
+    assert stored == stats.compute_platform_stats()
+    assert isinstance(stored['total_deposits'], Decimal)
+    assert isinstance(db.session.get(PlatformStats, stats.STATS_ID).total_deposits_minor, int)
+
+def test_migration_converts_float_counters(app_context):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE platform_stats (id INTEGER PRIMARY KEY, total_users INTEGER NOT NULL, "
+            "total_games INTEGER NOT NULL, total_deposits FLOAT NOT NULL, total_withdrawals FLOAT NOT NULL, "
+            "stats_date DATE, today_deposits FLOAT NOT NULL, today_withdrawals FLOAT NOT NULL, "
+            "pending_deposits INTEGER NOT NULL, pending_withdrawals INTEGER NOT NULL, updated_at DATETIME)"))
+        connection.execute(text(
+            "INSERT INTO platform_stats VALUES (1, 5, 2, 1234.5600000001, 0.3, '2026-01-02', 0.1, 0, 3, 1, NULL)"))
+        platform_stats_minor_units(connection)
+        row = connection.execute(text("SELECT * FROM platform_stats")).mappings().one()
+    assert row['total_deposits_minor'] == 123456
+    assert row['total_withdrawals_minor'] == 30
+    assert row['today_deposits_minor'] == 10
+    assert row['today_withdrawals_minor'] == 0
+    assert (row['total_users'], row['pending_deposits'], row['pending_withdrawals']) == (5, 3, 1)
+    assert 'total_deposits' not in row
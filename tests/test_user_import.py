@@ -0,0 +1,40 @@
+import csv
+import io
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from utils.user_import import import_users
+
+def test_duplicate_username_within_a_chunk_is_skipped(app, app_context):
+    from models import User
+    password_hash = generate_password_hash('pw')
+    rows = [
+        {'full_name': 'Import One', 'phone': '09000000001', 'username': 'dup_import', 'password_hash': password_hash},
+        {'full_name': 'Import Two', 'phone': '09000000002', 'username': 'dup_import', 'password_hash': password_hash},
+        {'full_name': 'Import Three', 'phone': '09000000001', 'password_hash': password_hash},
+        {'full_name': 'Import Four', 'phone': '09000000004', 'username': 'player1', 'password_hash': password_hash},
+    ]
+    report = import_users(rows, workers=1)
+    assert report['inserted'] == 1
+    assert report['skipped'] == [('09000000002', 'username already taken'),
+                                 ('09000000001', 'phone already registered'),
+                                 ('09000000004', 'username already taken')]
+    assert User.query.filter_by(username='dup_import').one().phone == '09000000001'
+
+def test_missing_columns_are_reported_before_importing(app, app_context):
+    reader = csv.DictReader(io.StringIO('name,phone,pass\nNo One,09000000009,pw\n'))
+    with pytest.raises(ValueError, match=r'full_name, password \(or password_hash\)'):
+        import_users(reader, workers=1)
+
+def test_overlong_partner_referral_code_is_replaced(app, app_context):
+    from models import User
+    reader = csv.DictReader(io.StringIO(
+        'full_name,phone,password_hash,referral_code,referred_by\n'
+        f'Long Code,09000000011,{generate_password_hash("pw")},PARTNER-CODE-12345,\n'
+        f'Referred,09000000012,{generate_password_hash("pw")},,PARTNER-CODE-12345\n'))
+    report = import_users(reader, workers=1)
+    assert report['inserted'] == 2 and report['referrals'] == 1
+    referrer = User.query.filter_by(phone='09000000011').one()
+    assert len(referrer.referral_code) <= 10
+    assert User.query.filter_by(phone='09000000012').one().referred_by == referrer.id
@@ -0,0 +1,89 @@
+"""Fingerprinted, precompressed static assets.
+
+build() copies every file under static/ to static/dist/ under a name that
+includes a hash of its content (css/style.css -> css/style.3f2a9c1e04bd.css),
+writes .gz and, when the optional brotli package is installed, .br siblings
+for text files, and records the mapping in static/dist/manifest.json.
+Templates keep calling url_for('static', filename=...); the url_for installed
+by init_app() points them at the hashed copy served by routes/assets.py.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from flask import url_for as flask_url_for
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+
+logger = logging.getLogger(__name__)
+
+def dist_folder(app):
+    return os.path.join(app.static_folder, DIST_DIR)
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)  # workers building at once never see a half-written file
+
+def build(app):
+    """Fingerprint and compress static files; returns the manifest {source name: hashed name}"""
+    dist = dist_folder(app)
+    manifest = {}
+    for directory, dirnames, filenames in os.walk(app.static_folder):
+        if os.path.abspath(directory) == os.path.abspath(app.static_folder) and DIST_DIR in dirnames:
+            dirnames.remove(DIST_DIR)
+        for filename in filenames:
+            source = os.path.join(directory, filename)
+            name = os.path.relpath(source, app.static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, extension = os.path.splitext(name)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+            manifest[name] = hashed
+
+            target = os.path.join(dist, hashed)
+            if os.path.exists(target):
+                continue  # same content was built before
+            _write(target, data)
+            if extension in COMPRESSIBLE:
+                _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + '.br', brotli.compress(data, quality=11))
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(dist_folder(app), MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def init_app(app):
+    """Load the manifest (or build it, if ASSETS_BUILD_ON_STARTUP) and install the url_for override"""
+    if app.config.get('ASSETS_BUILD_ON_STARTUP', False):
+        manifest = build(app)
+    else:
+        manifest = load_manifest(app)
+        if not manifest:
+            logger.warning("No static asset manifest; run `flask assets build`. Serving unversioned static files.")
+    app.extensions['asset_manifest'] = manifest
+
+    def url_for(endpoint, **values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+            endpoint = 'assets.serve'
+        return flask_url_for(endpoint, **values)
+
+    app.jinja_env.globals['url_for'] = url_for
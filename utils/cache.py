@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, session, make_response
+
+class GenerationStamp:
+    """Cross-worker invalidation marker stored as a small file in the instance folder.
+
+    Every gunicorn worker on the host sees the same file, so bumping it tells all
+    of them that their in-memory copies are stale. current() re-reads the file at
+    most once per check_interval seconds per worker.
+    """
+
+    def __init__(self, name, check_interval=1.0):
+        self.name = name
+        self.check_interval = check_interval
+        self._last = ('', float('-inf'))  # (generation, checked_at)
+
+    def path(self):
+        return os.path.join(current_app.instance_path, f'{self.name}.generation')
+
+    def read(self):
+        try:
+            with open(self.path()) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ''
+
+    def current(self):
+        generation, checked_at = self._last
+        now = time.monotonic()
+        if now - checked_at >= self.check_interval:
+            generation = self.read()
+            self._last = (generation, now)
+        return generation
+
+    def bump(self):
+        path = self.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f'{time.time_ns()}-{os.getpid()}')
+        os.replace(tmp_path, path)
+        self._last = ('', float('-inf'))
+
+class CachedValue:
+    """Process-local cache of a single value, invalidated by a GenerationStamp.
+
+    The value is reloaded when the stamp changes (noticed within the stamp's
+    check_interval) or when it is older than ttl seconds, whichever comes first.
+    The ttl covers deployments where workers do not share a disk.
+    """
+
+    def __init__(self, name, loader, ttl=300.0):
+        self.stamp = GenerationStamp(name)
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entry = None  # (value, generation, loaded_at)
+
+    def get(self):
+        generation = self.stamp.current()
+        entry = self._entry
+        if entry is not None:
+            value, loaded_generation, loaded_at = entry
+            if loaded_generation == generation and time.monotonic() - loaded_at < self.ttl:
+                return value
+        with self._lock:
+            value = self.loader()
+            self._entry = (value, generation, time.monotonic())
+            return value
+
+    def invalidate(self):
+        """Drop the local copy and tell the other workers to drop theirs"""
+        self.stamp.bump()
+        self._entry = None
+
+class PageCache:
+    """Rendered HTML for public pages, keyed by endpoint and query string.
+
+    Entries expire after ttl seconds or as soon as the stamp is bumped by
+    invalidate(), and the least recently used entry is evicted once there are
+    max_entries. Only logged-out visitors share cached pages: the navbar shows a
+    logged-in player's name and balance, which must not lag behind a deposit
+    being approved, so their requests (and any with pending flash messages) are
+    rendered normally.
+    """
+
+    def __init__(self, name, ttl=60.0, max_entries=256):
+        self.stamp = GenerationStamp(name)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (body, etag, last_modified, generation, stored_at), oldest use first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[3] != self.stamp.current() or time.monotonic() - entry[4] >= self.ttl:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, body):
+        entry = (body, hashlib.md5(body.encode('utf-8')).hexdigest(),
+                 datetime.now(timezone.utc).replace(microsecond=0),
+                 self.stamp.current(), time.monotonic())
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self):
+        self.stamp.bump()
+        self._entries.clear()
+
+    def cached(self, view):
+        """View decorator serving cached HTML with ETag/Last-Modified revalidation"""
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            if '_flashes' in session or session.get('user_id') is not None:
+                return view(*args, **kwargs)
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+            entry = self.get(key)
+            if entry is None:
+                body = view(*args, **kwargs)
+                if not isinstance(body, str):
+                    return body
+                entry = self.set(key, body)
+            body, etag, last_modified = entry[:3]
+            response = make_response(body)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response.make_conditional(request)
+        return decorated_function
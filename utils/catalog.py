@@ -0,0 +1,220 @@
+"""In-memory games catalog with token and prefix search.
+
+Each worker keeps every game as a small immutable GameCard, an inverted index
+from title/category tokens to game ids, the sorted token list (so a prefix is
+a bisect range), and the ids pre-sorted for each listing order. Listing,
+filtering, searching and paging never touch the database. Updates build a new
+snapshot and swap it in, so concurrent readers never see a half-built index.
+
+admin.add_game calls add(), which indexes the new game incrementally and bumps a
+GenerationStamp; other workers notice the bump on their next search and load
+only the games with a higher id. A full rebuild happens every CATALOG_REBUILD_TTL
+seconds (default 300) to pick up anything changed outside the app.
+"""
+import bisect
+import re
+import threading
+import time
+from datetime import datetime
+from math import ceil
+from typing import NamedTuple, Optional
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from models import Game
+from utils.cache import GenerationStamp
+
+TOKEN = re.compile(r'\w+')
+EPOCH = datetime(1970, 1, 1)
+SORTS = {
+    'newest': lambda card: (EPOCH - card.created_at, -card.id),  # a timedelta that shrinks as created_at grows
+    'oldest': lambda card: (card.created_at, card.id),
+    'title': lambda card: (card.title.casefold(), card.id),
+    'min_bet': lambda card: (card.min_bet, card.id),
+}
+DEFAULT_SORT = 'newest'
+MAX_PER_PAGE = 100
+
+class GameCard(NamedTuple):
+    id: int
+    title: str
+    category: str
+    thumbnail: Optional[str]
+    winning_percentage: float
+    min_bet: float
+    max_bet: float
+    is_active: bool
+    created_at: datetime
+
+    @classmethod
+    def from_game(cls, game):
+        """From a Game or a row of _columns()"""
+        return cls(game.id, game.title, game.category, game.thumbnail, game.winning_percentage or 0.0,
+                   game.min_bet or 0.0, game.max_bet or 0.0, bool(game.is_active),
+                   game.created_at or datetime.utcnow())
+
+class CatalogPage:
+    """One page of catalog results"""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = max(1, ceil(total / per_page))
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+
+def tokenize(text):
+    return TOKEN.findall((text or '').casefold())
+
+class _Index:
+    """One immutable snapshot of the catalog; readers keep using theirs while a new one is built"""
+
+    def __init__(self, cards):
+        self.cards = {card.id: card for card in cards}
+        self.postings = {}  # token -> frozenset of game ids
+        for card in cards:
+            for token in _card_tokens(card):
+                self.postings.setdefault(token, set()).add(card.id)
+        self.postings = {token: frozenset(ids) for token, ids in self.postings.items()}
+        self.tokens = sorted(self.postings)
+        self.orders = {sort: sorted((key(card), card.id) for card in cards) for sort, key in SORTS.items()}
+        self.active = frozenset(card.id for card in cards if card.is_active)
+        self.categories = {}  # casefolded category -> frozenset of game ids
+        for card in cards:
+            self.categories.setdefault(card.category.casefold(), set()).add(card.id)
+        self.categories = {category: frozenset(ids) for category, ids in self.categories.items()}
+
+    def with_card(self, card):
+        """A copy with card added, without re-sorting or re-tokenizing the rest"""
+        index = _Index.__new__(_Index)
+        index.cards = {**self.cards, card.id: card}
+        index.postings = dict(self.postings)
+        index.tokens = list(self.tokens)
+        for token in _card_tokens(card):
+            ids = index.postings.get(token)
+            if ids is None:
+                bisect.insort(index.tokens, token)
+                ids = frozenset()
+            index.postings[token] = ids | {card.id}
+        index.orders = {}
+        for sort, key in SORTS.items():
+            order = list(self.orders[sort])
+            bisect.insort(order, (key(card), card.id))
+            index.orders[sort] = order
+        index.active = self.active | {card.id} if card.is_active else self.active
+        category = card.category.casefold()
+        index.categories = {**self.categories, category: self.categories.get(category, frozenset()) | {card.id}}
+        return index
+
+def _columns():
+    return select(Game.id, Game.title, Game.category, Game.thumbnail, Game.winning_percentage,
+                  Game.min_bet, Game.max_bet, Game.is_active, Game.created_at)
+
+def _card_tokens(card):
+    return set(tokenize(card.title) + tokenize(card.category))
+
+class Catalog:
+    def __init__(self, name='catalog'):
+        # Checked on every search: add_game bumps this before the public page cache, so a worker
+        # that re-renders /games after noticing the page cache bump always sees the new game
+        self.stamp = GenerationStamp(name, check_interval=0)
+        self._lock = threading.Lock()
+        self._index = _Index([])
+        self._generation = None
+        self._built_at = float('-inf')
+
+    def _rebuild(self):
+        self._index = _Index([GameCard.from_game(row) for row in db.session.execute(_columns().order_by(Game.id))])
+        self._built_at = time.monotonic()
+
+    def _add(self, games):
+        index = self._index
+        for game in games:
+            if game.id not in index.cards:
+                index = index.with_card(GameCard.from_game(game))
+        self._index = index
+
+    def _fresh(self):
+        """Bring this worker's copy up to date, cheaply when possible, and return it"""
+        generation = self.stamp.current()
+        ttl = current_app.config.get('CATALOG_REBUILD_TTL', 300)
+        if generation == self._generation and time.monotonic() - self._built_at < ttl:
+            return self._index
+        # While another thread refreshes, keep serving the previous snapshot if there is one
+        if not self._lock.acquire(blocking=self._generation is None):
+            return self._index
+        try:
+            if time.monotonic() - self._built_at >= ttl:
+                self._rebuild()
+            elif generation != self._generation:
+                newest = max(self._index.cards, default=0)
+                self._add(db.session.execute(_columns().where(Game.id > newest).order_by(Game.id)))
+            self._generation = generation
+            return self._index
+        finally:
+            self._lock.release()
+
+    def add(self, game):
+        """Index a just-committed game here and tell the other workers to pick it up"""
+        self._fresh()
+        with self._lock:
+            self._add([game])
+            self.stamp.bump()
+            # This worker already has the game; don't reload on our own bump
+            self._generation = self.stamp.current()
+
+    @staticmethod
+    def _matching(index, query):
+        """Ids whose title or category has a token starting with every query token, or None for no query"""
+        terms = tokenize(query)
+        if not terms:
+            return None
+        matched = None
+        for term in sorted(set(terms), key=len, reverse=True):  # longest terms are usually the rarest
+            ids = set()
+            for position in range(bisect.bisect_left(index.tokens, term), len(index.tokens)):
+                token = index.tokens[position]
+                if not token.startswith(term):
+                    break
+                ids |= index.postings[token]
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched
+
+    def search(self, query='', category=None, sort=DEFAULT_SORT, page=1, per_page=24, active_only=True):
+        """A CatalogPage of games matching query and category, in the given order"""
+        index = self._fresh()
+        order = index.orders.get(sort) or index.orders[DEFAULT_SORT]
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        page = max(1, page)
+
+        filters = [ids for ids in (self._matching(index, query),
+                                   index.categories.get(category.casefold(), frozenset()) if category else None,
+                                   index.active if active_only else None) if ids is not None]
+        if not filters:
+            selected = [game_id for _, game_id in order]
+        else:
+            matched = frozenset.intersection(*map(frozenset, filters)) if len(filters) > 1 else filters[0]
+            if len(matched) < len(order) // 8:
+                # Few hits: sorting them is cheaper than walking the whole order
+                key = SORTS.get(sort, SORTS[DEFAULT_SORT])
+                selected = [card.id for card in sorted((index.cards[game_id] for game_id in matched), key=key)]
+            else:
+                selected = [game_id for _, game_id in order if game_id in matched]
+        start = (page - 1) * per_page
+        return CatalogPage([index.cards[game_id] for game_id in selected[start:start + per_page]],
+                           page, per_page, len(selected))
+
+    def suggest(self, query, category=None, limit=10):
+        """Type-ahead: the first limit active games matching query, best title matches first"""
+        if not tokenize(query):
+            return []
+        results = self.search(query, category, sort='title', per_page=MAX_PER_PAGE).items
+        prefix = query.strip().casefold()
+        results.sort(key=lambda card: not card.title.casefold().startswith(prefix))  # stable: keeps title order
+        return results[:limit]
+
+catalog = Catalog()
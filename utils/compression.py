@@ -0,0 +1,110 @@
+"""gzip/brotli compression for dynamic responses.
+
+Wraps the WSGI app next to ProxyFix. A response is compressed when the client
+accepts br or gzip, it has a compressible Content-Type, a Content-Length of at
+least min_size and no Content-Encoding yet. Responses without a Content-Length
+(streamed exports) and partial content pass through untouched, as do
+precompressed assets and file offloads. Every response with a compressible
+Content-Type gets Vary: Accept-Encoding, compressed or not, so a shared cache
+never hands the identity body it stored for one client to another that asked
+for gzip (or the reverse).
+"""
+import gzip
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml',
+                      'image/svg+xml')
+SKIP_STATUSES = ('204', '206', '304')
+
+class CompressionMiddleware:
+    def __init__(self, app, level=6, brotli_quality=4, min_size=1024):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+
+    def _encoding(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _should_compress(self, status, headers):
+        if status[:3] in SKIP_STATUSES or 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if not _compressible(headers):
+            return False
+        length = headers.get('Content-Length')
+        return length is not None and length.isdigit() and int(length) >= self.min_size
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def __call__(self, environ, start_response):
+        encoding = self._encoding(environ)
+        captured = {}
+        buffered = []
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=Headers(headers), exc_info=exc_info)
+            return buffered.append
+
+        app_iter = self.app(environ, capture)
+        if not captured:
+            # start_response is deferred to the first chunk
+            app_iter = iter(app_iter)
+            first = next(app_iter, b'')
+            buffered.append(first)
+        status, headers = captured['status'], captured['headers']
+        if _compressible(headers):
+            _vary_on_encoding(headers)
+
+        if encoding is None or not self._should_compress(status, headers):
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            if not buffered:
+                return app_iter
+            return _chain(buffered, app_iter)
+
+        try:
+            body = b''.join(buffered) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        body = self.compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(body))
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # The compressed bytes differ, so the tag can only promise semantic equivalence
+            headers['ETag'] = f'W/{etag}'
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+        return [body]
+
+def _compressible(headers):
+    content_type = headers.get('Content-Type', '')
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith('text/event-stream')
+
+def _vary_on_encoding(headers):
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in (field.strip().lower() for field in vary.split(',')):
+        headers['Vary'] = f'{vary}, Accept-Encoding'
+
+def _chain(buffered, app_iter):
+    try:
+        yield from buffered
+        yield from app_iter
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
@@ -0,0 +1,123 @@
+"""Streaming CSV / NDJSON dumps of transactions, deposits and withdrawals.
+
+Rows are read with yield_per (a server-side cursor on PostgreSQL and MySQL,
+incremental fetchmany on SQLite) and encoded in batches, so memory use does
+not depend on how many rows are exported. With compress=True the output is
+gzipped on the fly.
+
+Money columns are written the same way in every export: a decimal amount with
+two places ("12.34", a string in NDJSON), whether the table stores integer
+minor units or a float.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select
+from app import db
+from models import Transaction, DepositRequest, WithdrawalRequest, from_minor
+
+BATCH_SIZE = 2000
+
+# kind -> (model, exported columns, column the status filter applies to)
+EXPORTS = {
+    'transactions': (Transaction, ('id', 'user_id', 'type', 'amount', 'description', 'created_at'), 'type'),
+    'deposits': (DepositRequest, ('id', 'user_id', 'amount', 'payment_method', 'transaction_id', 'status',
+                                  'bonus_amount', 'admin_notes', 'created_at', 'processed_at'), 'status'),
+    'withdrawals': (WithdrawalRequest, ('id', 'user_id', 'amount', 'payment_method', 'account_details', 'status',
+                                        'admin_notes', 'created_at', 'processed_at'), 'status'),
+}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+MONEY_COLUMNS = {'amount', 'bonus_amount'}
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date, None for an empty value; raises ValueError otherwise"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def build_query(kind, since=None, until=None, status=None):
+    """SELECT for one export; since and until are dates, both inclusive"""
+    if kind not in EXPORTS:
+        raise ValueError(f'Unknown export {kind!r}')
+    model, columns, status_column = EXPORTS[kind]
+    query = select(*(_column(model, name) for name in columns))
+    if since:
+        query = query.where(model.created_at >= datetime.combine(since, datetime.min.time()))
+    if until:
+        query = query.where(model.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    if status:
+        query = query.where(getattr(model, status_column) == status)
+    return query.order_by(model.id)
+
+def _column(model, name):
+    """Money columns are selected as integer minor units, under their decimal name"""
+    if name not in MONEY_COLUMNS:
+        return getattr(model, name)
+    minor = getattr(model, f'{name}_minor', None)
+    if minor is None:  # a float column, rounded per row like to_minor()
+        minor = db.func.round(db.func.coalesce(getattr(model, name), 0) * 100)
+    return minor.label(name)
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if isinstance(value, Decimal) else value
+
+def _encode(kind, rows, fmt):
+    """Yield text chunks of about BATCH_SIZE rows each"""
+    columns = EXPORTS[kind][1]
+    money = [position for position, name in enumerate(columns) if name in MONEY_COLUMNS]
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    for partition in rows.partitions():
+        for row in partition:
+            row = list(row)
+            for position in money:
+                row[position] = from_minor(int(row[position] or 0))
+            if fmt == 'csv':
+                writer.writerow([_value(value) for value in row])
+            else:
+                buffer.write(json.dumps(dict(zip(columns, map(_value, row)))))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def generate(kind, fmt='csv', since=None, until=None, status=None, compress=False):
+    """Return an iterator of the export as bytes, optionally gzipped.
+
+    Unknown kinds and formats raise ValueError here, before anything is streamed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}')
+    query = build_query(kind, since, until, status)
+
+    def chunks():
+        rows = db.session.execute(query.execution_options(yield_per=BATCH_SIZE))
+        try:
+            for text in _encode(kind, rows, fmt):
+                yield text.encode()
+        finally:
+            rows.close()
+
+    def gzipped():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        for chunk in chunks():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    return gzipped() if compress else chunks()
+
+def filename(kind, fmt, since=None, until=None, compress=False):
+    period = '_'.join(day.isoformat() for day in (since, until) if day)
+    name = f"{kind}_{period}" if period else kind
+    return f"{name}.{fmt}{'.gz' if compress else ''}"
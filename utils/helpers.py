@@ -1,11 +1,24 @@
+import time
 from functools import wraps
-from flask import session, redirect, url_for, flash
-from models import User, Admin
+from types import SimpleNamespace
+from flask import session, redirect, url_for, flash, g, current_app
+from sqlalchemy.orm import load_only
+from app import db
+from models import User, Admin, SiteSettings, from_minor
+from utils.cache import CachedValue
+
+IDENTITY_SNAPSHOT_TTL = 30
+# What the player pages and templates read; password_hash loads on demand when a password is checked
+CURRENT_USER_COLUMNS = (User.full_name, User.phone, User.username, User.referral_code, User.referred_by,
+                        User.balance_minor, User.bonus_balance_minor, User.referral_commission_minor,
+                        User.referral_count, User.is_active, User.created_at, User.last_login)
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        user = get_current_user()
+        if user is None or not user.is_active:
+            logout_user()
             flash('Please login to access this page', 'error')
             return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
@@ -14,20 +27,93 @@ def login_required(f):
 def admin_login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'admin_id' not in session:
+        admin = get_current_admin()
+        if admin is None or not admin.is_active:
+            session.pop('admin_id', None)
             return redirect(url_for('admin.login'))
         return f(*args, **kwargs)
     return decorated_function
 
 def get_current_user():
-    if 'user_id' in session:
-        return User.query.get(session['user_id'])
-    return None
+    """The logged-in User, loaded at most once per request"""
+    if 'user_id' not in session:
+        return None
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, session['user_id'], options=[load_only(*CURRENT_USER_COLUMNS)])
+    return g.current_user
 
 def get_current_admin():
-    if 'admin_id' in session:
-        return Admin.query.get(session['admin_id'])
-    return None
+    """The logged-in Admin, loaded at most once per request"""
+    if 'admin_id' not in session:
+        return None
+    if 'current_admin' not in g:
+        g.current_admin = Admin.query.options(load_only(Admin.username, Admin.role, Admin.is_active))\
+            .filter_by(id=session['admin_id']).first()
+    return g.current_admin
+
+def login_user(user):
+    session['user_id'] = user.id
+    g.current_user = user
+    _store_identity(user)
+
+def logout_user():
+    session.pop('user_id', None)
+    session.pop('identity', None)
+    g.pop('current_user', None)
+    g.pop('identity', None)
+
+def _store_identity(user, snapshot=None):
+    fresh = {'id': user.id, 'name': user.full_name, 'balance_minor': user.balance_minor,
+             'bonus_minor': user.bonus_balance_minor}
+    # Only rewrite the cookie when something changed or the snapshot expired
+    if snapshot is None or any(snapshot.get(key) != value for key, value in fresh.items()):
+        session['identity'] = dict(fresh, at=time.time())
+    return session['identity']
+
+def get_identity():
+    """Name and balances of the logged-in user for the navbar and sidebars, or None.
+    
+    Served from a snapshot in the (signed) session cookie and reloaded once it is
+    older than IDENTITY_SNAPSHOT_TTL seconds, so balances shown here may lag that long.
+    """
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    if 'identity' in g:
+        return g.identity
+    snapshot = session.get('identity')
+    ttl = current_app.config.get('IDENTITY_SNAPSHOT_TTL', IDENTITY_SNAPSHOT_TTL)
+    expired = not snapshot or snapshot.get('id') != user_id or time.time() - snapshot.get('at', 0) >= ttl
+    if expired or 'current_user' in g:
+        # Refresh for free when this request already loaded the user
+        user = get_current_user()
+        if user is None:
+            return None
+        snapshot = _store_identity(user, None if expired else snapshot)
+    g.identity = SimpleNamespace(id=snapshot['id'], full_name=snapshot['name'],
+                                 balance=from_minor(snapshot['balance_minor']),
+                                 bonus_balance=from_minor(snapshot['bonus_minor']))
+    return g.identity
+
+def _load_site_settings():
+    settings = SiteSettings.query.first()
+    if not settings:
+        return None
+    # Plain snapshot so the cached copy never touches a (possibly closed) session
+    return SimpleNamespace(**{column.name: getattr(settings, column.name)
+                              for column in SiteSettings.__table__.columns})
+
+_site_settings = CachedValue('site_settings', _load_site_settings)
+
+def get_site_settings():
+    """Read-only SiteSettings served from memory, or None if none are saved yet.
+    
+    Changes made through invalidate_site_settings() reach every worker within a second.
+    """
+    return _site_settings.get()
+
+def invalidate_site_settings():
+    _site_settings.invalidate()
 
 def format_currency(amount, currency='USD'):
     """Format amount as currency"""
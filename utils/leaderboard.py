@@ -0,0 +1,89 @@
+"""Top referrers by commission earned.
+
+Each worker keeps the top LEADERBOARD_SIZE referrers in memory (a CachedValue,
+so all workers drop their copy when the generation stamp is bumped). Loading
+it is one walk of the first rows of ix_user_referral_commission, never a scan
+of the user table. When deposits credit commissions, record_commissions()
+checks the referrers' new totals against the cached board and only bumps the
+stamp if one of them is on it or now beats the last entry. Ranks outside the
+board are counted on the same index.
+"""
+from typing import NamedTuple
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+from app import db
+from models import User, from_minor
+from utils.cache import CachedValue
+
+DEFAULT_SIZE = 100
+
+class Entry(NamedTuple):
+    rank: int
+    user_id: int
+    full_name: str
+    phone: str
+    referral_code: str
+    referral_count: int
+    referral_commission_minor: int
+
+    @property
+    def referral_commission(self):
+        return from_minor(self.referral_commission_minor)
+
+    @property
+    def display_name(self):
+        """First name and last initial, for public pages"""
+        parts = self.full_name.split()
+        return f'{parts[0]} {parts[-1][0]}.' if len(parts) > 1 else (parts[0] if parts else 'Player')
+
+def _ordering():
+    return User.referral_commission_minor.desc(), User.id.asc()
+
+def size():
+    return current_app.config.get('LEADERBOARD_SIZE', DEFAULT_SIZE)
+
+def _load():
+    rows = db.session.execute(
+        select(User.id, User.full_name, User.phone, User.referral_code, User.referral_count,
+               User.referral_commission_minor)
+        .where(User.referral_commission_minor > 0).order_by(*_ordering()).limit(size()))
+    return [Entry(rank, *row) for rank, row in enumerate(rows, start=1)]
+
+_board = CachedValue('leaderboard', _load)
+
+def top(limit=10):
+    """The first limit entries (at most LEADERBOARD_SIZE)"""
+    return _board.get()[:limit]
+
+def rank(user_id):
+    """1-based rank of user_id by commission earned, or None if they have earned none"""
+    for entry in _board.get():
+        if entry.user_id == user_id:
+            return entry.rank
+    commission = db.session.execute(select(User.referral_commission_minor)
+                                    .where(User.id == user_id)).scalar()
+    if not commission:
+        return None
+    ahead = select(func.count()).select_from(User).where(or_(
+        User.referral_commission_minor > commission,
+        and_(User.referral_commission_minor == commission, User.id < user_id)))
+    return db.session.execute(ahead).scalar() + 1
+
+def record_commissions(referrer_ids):
+    """Call after committing commissions credited to referrer_ids"""
+    referrer_ids = set(referrer_ids)
+    if not referrer_ids:
+        return
+    board = _board.get()
+    on_board = {entry.user_id for entry in board}
+    if referrer_ids & on_board or len(board) < size():
+        _board.invalidate()
+        return
+    cutoff = board[-1].referral_commission_minor
+    best = db.session.execute(select(func.max(User.referral_commission_minor))
+                              .where(User.id.in_(referrer_ids))).scalar() or 0
+    if best >= cutoff:
+        _board.invalidate()
+
+def invalidate():
+    _board.invalidate()
@@ -0,0 +1,101 @@
+"""Balance changes for users, applied atomically in the database.
+
+Every change is a single ``UPDATE user SET <account>_minor = <account>_minor + :delta``
+so concurrent workers never overwrite each other's updates, and the matching
+Transaction rows are inserted in the same transaction. Amounts are integer
+minor units (cents); use to_minor() on anything that came from a form.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple, Optional
+from sqlalchemy import bindparam, insert, select
+from app import db
+from models import User, Transaction
+
+ACCOUNTS = ('balance', 'bonus_balance', 'referral_commission')
+
+class LedgerError(Exception):
+    reason = 'ledger error'
+
+class AlreadyProcessed(LedgerError):
+    reason = 'already processed'
+
+class InsufficientFunds(LedgerError):
+    reason = 'insufficient balance'
+
+class ConcurrentUpdate(LedgerError):
+    reason = 'changed by someone else'
+
+class Posting(NamedTuple):
+    user_id: int
+    account: str  # one of ACCOUNTS
+    amount_minor: int
+    type: Optional[str] = None  # Transaction type; None posts without a Transaction row
+    description: Optional[str] = None
+
+def to_minor(amount):
+    """Convert a float/str/Decimal amount to integer minor units, rounding half up"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def _column(account):
+    if account not in ACCOUNTS:
+        raise ValueError(f'Unknown account {account!r}')
+    return User.__table__.c[f'{account}_minor']
+
+def post(postings, now=None):
+    """Apply postings in the caller's transaction.
+
+    Deltas are summed per user and account and applied with one executemany
+    UPDATE per account. Debits from the main balance may not take it below
+    zero; InsufficientFunds is raised (and the caller should roll back) if they do.
+    """
+    now = now or datetime.utcnow()
+    table = User.__table__
+    deltas = defaultdict(lambda: defaultdict(int))
+    for posting in postings:
+        deltas[posting.account][posting.user_id] += posting.amount_minor
+
+    for account, per_user in deltas.items():
+        column = _column(account)
+        params = [{'user_id': user_id, 'delta': delta} for user_id, delta in per_user.items() if delta]
+        if params:
+            db.session.execute(table.update()
+                               .where(table.c.id == bindparam('user_id'))
+                               .values({column: column + bindparam('delta')}), params)
+
+    debited = [user_id for user_id, delta in deltas.get('balance', {}).items() if delta < 0]
+    if debited:
+        overdrawn = db.session.execute(select(table.c.id)
+                                       .where(table.c.id.in_(debited), table.c.balance_minor < 0)).scalars().all()
+        if overdrawn:
+            raise InsufficientFunds(overdrawn)
+
+    transactions = [{'user_id': posting.user_id, 'type': posting.type, 'amount_minor': posting.amount_minor,
+                     'description': posting.description, 'created_at': now}
+                    for posting in postings if posting.type]
+    if transactions:
+        db.session.execute(insert(Transaction), transactions)
+
+def adjust_to(user_id, account, expected_minor, new_minor, type, description):
+    """Set an account to new_minor, provided it still holds expected_minor (compare-and-set)"""
+    table = User.__table__
+    column = _column(account)
+    delta = new_minor - expected_minor
+    result = db.session.execute(table.update()
+                                .where(table.c.id == user_id, column == expected_minor)
+                                .values({column: column + delta}))
+    if result.rowcount != 1:
+        raise ConcurrentUpdate(user_id)
+    if delta:
+        db.session.execute(insert(Transaction), [{'user_id': user_id, 'type': type, 'amount_minor': delta,
+                                                  'description': description, 'created_at': datetime.utcnow()}])
+
+def claim(model, ids, status, now, admin_notes=None):
+    """Move pending requests to status in one UPDATE, guarded so a request is only processed once"""
+    table = model.__table__
+    result = db.session.execute(table.update()
+                                .where(table.c.id.in_(ids), table.c.status == 'pending')
+                                .values(status=status, processed_at=now, admin_notes=admin_notes))
+    if result.rowcount != len(ids):
+        raise AlreadyProcessed(ids)
@@ -0,0 +1,174 @@
+"""Per-endpoint request metrics in Prometheus text format.
+
+Every request records its latency, SQL statement count, DB time and response
+size, labelled by endpoint. Each worker process keeps its numbers in memory
+and writes them to <METRICS_DIR>/<pid>.json at most once per
+METRICS_FLUSH_INTERVAL seconds; /metrics adds up the files of every worker,
+so counters and histograms stay correct behind gunicorn. Files of exited
+workers are kept (their counts still happened) until `flask bootstrap`
+clears the directory on the next deploy.
+"""
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+from flask import g, request
+from utils import sql_events
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request latency by endpoint.', TIME_BUCKETS),
+    'http_request_db_queries': ('SQL statements issued per request.', QUERY_BUCKETS),
+    'http_request_db_seconds': ('Time spent in SQL per request.', TIME_BUCKETS),
+    'http_response_size_bytes': ('Response body size before compression.', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'http_requests_total': 'Requests by endpoint, method and status.',
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+_state = {'pid': None, 'counters': {}, 'histograms': {}, 'flushed': 0.0}
+_flush_interval = 1.0
+
+def _labels_key(labels):
+    return json.dumps(sorted(labels.items()))
+
+def _own_state():
+    # A forked worker starts from a copy of the parent's numbers; drop them so nothing is counted twice
+    if _state['pid'] != os.getpid():
+        _state.update(pid=os.getpid(), counters={}, histograms={}, flushed=0.0)
+    return _state
+
+def inc(name, labels, value=1):
+    with _lock:
+        counters = _own_state()['counters'].setdefault(name, {})
+        key = _labels_key(labels)
+        counters[key] = counters.get(key, 0) + value
+
+def observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    with _lock:
+        series = _own_state()['histograms'].setdefault(name, {})
+        key = _labels_key(labels)
+        data = series.get(key)
+        if data is None:
+            data = series[key] = {'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                data['buckets'][index] += 1
+        data['sum'] += value
+        data['count'] += 1
+
+def flush(directory, force=False):
+    """Write this worker's numbers to its file (atomically)"""
+    with _lock:
+        state = _own_state()
+        if not force and time.monotonic() - state['flushed'] < _flush_interval:
+            return
+        state['flushed'] = time.monotonic()
+        payload = json.dumps({'counters': state['counters'], 'histograms': state['histograms']})
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as f:
+        f.write(payload)
+    os.replace(path + '.tmp', path)
+
+def collect(directory):
+    """Merge the files of every worker into {'counters': ..., 'histograms': ...}"""
+    merged = {'counters': {}, 'histograms': {}}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now
+        for name, series in data['counters'].items():
+            target = merged['counters'].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+        for name, series in data['histograms'].items():
+            target = merged['histograms'].setdefault(name, {})
+            for key, value in series.items():
+                existing = target.get(key)
+                if existing is None:
+                    target[key] = {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+                else:
+                    existing['buckets'] = [a + b for a, b in zip(existing['buckets'], value['buckets'])]
+                    existing['sum'] += value['sum']
+                    existing['count'] += value['count']
+    return merged
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key, **extra):
+    labels = dict(json.loads(key), **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())) + '}'
+
+def render(merged):
+    """Prometheus text exposition format"""
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for key, value in sorted(merged['counters'].get(name, {}).items()):
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, data in sorted(merged['histograms'].get(name, {}).items()):
+            for bound, count in zip(buckets, data['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(key, le=bound)} {count}')
+            lines.append(f'{name}_bucket{_format_labels(key, le="+Inf")} {data["count"]}')
+            lines.append(f'{name}_sum{_format_labels(key)} {data["sum"]}')
+            lines.append(f'{name}_count{_format_labels(key)} {data["count"]}')
+    return '\n'.join(lines) + '\n'
+
+@sql_events.subscribe
+def _record_statement(statement, parameters, executemany, seconds):
+    current = getattr(_local, 'request', None)
+    if current is not None:
+        current[0] += 1
+        current[1] += seconds
+
+def metrics_dir(app):
+    return app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+
+def clear(app):
+    shutil.rmtree(metrics_dir(app), ignore_errors=True)
+
+def init_app(app):
+    """Record request metrics for every endpoint of app"""
+    global _flush_interval
+    _flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    directory = metrics_dir(app)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        _local.request = [0, 0.0]
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        queries, db_seconds = getattr(_local, 'request', None) or (0, 0.0)
+        _local.request = None
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        labels = {'endpoint': endpoint}
+        inc('http_requests_total', {'endpoint': endpoint, 'method': request.method,
+                                    'status': str(response.status_code)})
+        observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+        observe('http_request_db_queries', labels, queries)
+        observe('http_request_db_seconds', labels, db_seconds)
+        if not response.is_streamed and response.content_length is not None:
+            observe('http_response_size_bytes', labels, response.content_length)
+        flush(directory)
+        return response
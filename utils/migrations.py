@@ -0,0 +1,250 @@
+"""Versioned schema migrations for databases created before a model change.
+
+db.create_all() only creates missing tables, so anything added to an existing
+table (indexes, columns) needs a numbered step here. Steps must be idempotent:
+on a fresh database create_all() has usually done the work already.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+from app import db
+from models import User, DepositRequest, WithdrawalRequest, Transaction, DailyRollup, PlatformStats
+
+logger = logging.getLogger(__name__)
+
+schema_version = db.Table(
+    'schema_version', db.metadata,
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200)),
+    db.Column('applied_at', db.DateTime),
+)
+
+def _create_indexes(connection, *indexes):
+    for index in indexes:
+        index.create(bind=connection, checkfirst=True)
+
+def _add_column(connection, table_name, column):
+    """ALTER TABLE ... ADD COLUMN for a model column, unless it already exists"""
+    if column.name in _column_names(connection, table_name):
+        return
+    preparer = connection.dialect.identifier_preparer
+    ddl = (f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN {preparer.quote(column.name)} "
+           f"{column.type.compile(dialect=connection.dialect)}")
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    connection.execute(text(ddl))
+
+def _column_names(connection, table_name):
+    return {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+def _index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+def hot_query_indexes(connection):
+    _create_indexes(connection,
+                    _index(User, 'ix_user_referred_by'),
+                    _index(DepositRequest, 'ix_deposit_request_status_created'),
+                    _index(WithdrawalRequest, 'ix_withdrawal_request_status_created'),
+                    _index(Transaction, 'ix_transaction_user_created'))
+
+def listing_indexes(connection):
+    _create_indexes(connection,
+                    _index(User, 'ix_user_created'),
+                    _index(DepositRequest, 'ix_deposit_request_created'),
+                    _index(WithdrawalRequest, 'ix_withdrawal_request_created'))
+
+def _rebuild_table(connection, model, select_columns):
+    """Recreate model's table from the current model definition and copy the rows across (SQLite only).
+
+    For changes SQLite's ALTER TABLE can't make, such as dropping a NOT NULL column.
+    select_columns maps each new column name to a SQL expression over the old table.
+    MySQL backs foreign keys with indexes that can't be dropped, so other databases
+    alter the table in place instead.
+    """
+    preparer = connection.dialect.identifier_preparer
+    table = model.__table__
+    legacy_name = f'{table.name}_legacy'
+    for index in inspect(connection).get_indexes(table.name):
+        connection.execute(text(f"DROP INDEX {preparer.quote(index['name'])}"))
+    connection.execute(text(f"ALTER TABLE {preparer.quote(table.name)} RENAME TO {preparer.quote(legacy_name)}"))
+    table.create(bind=connection)
+    names = ', '.join(preparer.quote(name) for name in select_columns)
+    connection.execute(text(f"INSERT INTO {preparer.quote(table.name)} ({names}) "
+                            f"SELECT {', '.join(select_columns.values())} FROM {preparer.quote(legacy_name)}"))
+    connection.execute(text(f"DROP TABLE {preparer.quote(legacy_name)}"))
+
+def money_minor_units(connection):
+    """Integer minor-unit columns for balances and ledger amounts, backfilled from the old floats"""
+    preparer = connection.dialect.identifier_preparer
+    user_table = User.__table__.name
+    legacy = _column_names(connection, user_table)
+    for name in ('balance', 'bonus_balance', 'referral_commission'):
+        _add_column(connection, user_table, User.__table__.c[f'{name}_minor'])
+        if name in legacy:
+            connection.execute(text(
+                f"UPDATE {preparer.quote(user_table)} "
+                f"SET {preparer.quote(name + '_minor')} = ROUND(COALESCE({preparer.quote(name)}, 0) * 100)"))
+
+    # The old float amount column is NOT NULL, so new inserts would fail against it
+    transaction_table = Transaction.__table__.name
+    if 'amount' not in _column_names(connection, transaction_table):
+        return
+    if connection.dialect.name == 'sqlite':
+        _rebuild_table(connection, Transaction, {
+            'id': 'id',
+            'user_id': 'user_id',
+            'type': 'type',
+            'amount_minor': 'ROUND(amount * 100)',
+            'description': 'description',
+            'created_at': 'created_at',
+        })
+        return
+    # MySQL and PostgreSQL drop the column in place, keeping the user_id foreign key and its index
+    quoted = preparer.quote(transaction_table)
+    _add_column(connection, transaction_table, Transaction.__table__.c.amount_minor)
+    connection.execute(text(f"UPDATE {quoted} SET {preparer.quote('amount_minor')} = ROUND(amount * 100)"))
+    connection.execute(text(f"ALTER TABLE {quoted} DROP COLUMN amount"))
+
+def daily_rollups(connection):
+    """Daily rollup table, filled from the requests processed so far"""
+    from utils import rollups
+    DailyRollup.__table__.create(bind=connection, checkfirst=True)
+    rollups.backfill(connection)
+
+def referral_counts(connection):
+    """Denormalized direct referral counts and an index for paging through a user's referrals"""
+    from utils import referrals
+    _add_column(connection, User.__table__.name, User.__table__.c.referral_count)
+    _create_indexes(connection, _index(User, 'ix_user_referred_created'))
+    referrals.recount(connection)
+
+def leaderboard_index(connection):
+    _create_indexes(connection, _index(User, 'ix_user_referral_commission'))
+
+def platform_stats_minor_units(connection):
+    """Integer minor-unit money counters on the dashboard summary, converted from the old floats"""
+    from utils.ledger import to_minor
+    table = PlatformStats.__table__
+    existing = _column_names(connection, table.name)
+    money = ('total_deposits', 'total_withdrawals', 'today_deposits', 'today_withdrawals')
+    if 'total_deposits' not in existing:
+        return
+    # A single-row table whose old float columns are NOT NULL: recreate it rather than ALTER
+    kept = [column for column in table.c if column.name in existing]
+    rows = connection.execute(select(*kept, *(db.column(name, db.Float) for name in money))
+                              .select_from(table)).mappings().all()
+    table.drop(bind=connection)
+    table.create(bind=connection)
+    for row in rows:
+        values = {column.name: row[column.name] for column in kept}
+        values.update({f'{name}_minor': to_minor(row[name] or 0) for name in money})
+        connection.execute(table.insert().values(**values))
+
+def listing_created_at(connection):
+    """Fill in created_at where it is missing on the keyset-paginated tables and make it NOT NULL"""
+    preparer = connection.dialect.identifier_preparer
+    for model in (User, DepositRequest, WithdrawalRequest):
+        table = model.__table__
+        created_at = table.c.created_at
+        missing = created_at.is_(None)
+        if connection.execute(select(table.c.id).where(missing).limit(1)).first() is not None:
+            # Unknown creation times sort with the oldest rows (or when they were processed, if they were)
+            oldest = connection.execute(select(db.func.min(created_at))).scalar() or datetime.utcnow()
+            fill = db.func.coalesce(table.c.processed_at, oldest) if 'processed_at' in table.c else oldest
+            connection.execute(table.update().where(missing).values(created_at=fill))
+        # SQLite can't change a column's constraints in place; the backfill and the ORM default cover it there
+        quoted = preparer.quote(table.name)
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text(f"ALTER TABLE {quoted} ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP, "
+                                    f"ALTER COLUMN created_at SET NOT NULL"))
+        elif connection.dialect.name == 'mysql':
+            connection.execute(text(f"ALTER TABLE {quoted} MODIFY created_at DATETIME NOT NULL "
+                                    f"DEFAULT CURRENT_TIMESTAMP"))
+
+MIGRATIONS = [
+    (1, 'Indexes for hot query shapes', hot_query_indexes),
+    (2, 'Indexes for keyset pagination of admin listings', listing_indexes),
+    (3, 'Store balances and transaction amounts in integer minor units', money_minor_units),
+    (4, 'Daily rollups of processed deposits and withdrawals', daily_rollups),
+    (5, 'Referral counters', referral_counts),
+    (6, 'Index for the top referrer leaderboard', leaderboard_index),
+    (7, 'Store dashboard money counters in integer minor units', platform_stats_minor_units),
+    (8, 'Require created_at on keyset-paginated tables', listing_created_at),
+]
+
+def current_version(connection):
+    return connection.execute(select(db.func.max(schema_version.c.version))).scalar() or 0
+
+def upgrade():
+    """Apply pending migrations in order, each in its own transaction. Returns the versions applied."""
+    schema_version.create(bind=db.engine, checkfirst=True)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with db.engine.begin() as connection:
+            if current_version(connection) >= version:
+                continue
+            logger.info("Applying schema migration %s: %s", version, description)
+            step(connection)
+            connection.execute(schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
+
+def bootstrap(admin_password='admin'):
+    """Create tables, apply migrations and seed the default admin. Returns (versions applied, admin created)."""
+    from models import Admin
+    
+    db.create_all()
+    applied = upgrade()
+    if Admin.query.filter_by(username='admin').first():
+        return applied, False
+    admin_user = Admin(username='admin', role='super_admin')
+    admin_user.set_password(admin_password)
+    db.session.add(admin_user)
+    db.session.commit()
+    return applied, True
+
+def hot_queries():
+    """Query shapes the app runs on every request to the matching pages"""
+    return {
+        'user dashboard transactions': select(Transaction)
+            .where(Transaction.user_id == 1).order_by(Transaction.created_at.desc()).limit(10),
+        'pending deposits': select(DepositRequest)
+            .where(DepositRequest.status == 'pending').order_by(DepositRequest.created_at.desc()).limit(20),
+        'pending withdrawals': select(WithdrawalRequest)
+            .where(WithdrawalRequest.status == 'pending').order_by(WithdrawalRequest.created_at.desc()).limit(20),
+        'referred users page': select(User).where(User.referred_by == 1)
+            .order_by(User.created_at.desc(), User.id.desc()).limit(21),
+        'admin users page': select(User)
+            .order_by(User.created_at.desc(), User.id.desc()).limit(21),
+        'admin deposits page': select(DepositRequest)
+            .order_by(DepositRequest.created_at.desc(), DepositRequest.id.desc()).limit(21),
+        'top referrers': select(User).where(User.referral_commission_minor > 0)
+            .order_by(User.referral_commission_minor.desc(), User.id.asc()).limit(100),
+        'admin withdrawals page': select(WithdrawalRequest)
+            .order_by(WithdrawalRequest.created_at.desc(), WithdrawalRequest.id.desc()).limit(21),
+    }
+
+def explain_full_scans(connection):
+    """Return {name: plan} for hot queries whose plan scans a whole table"""
+    dialect = connection.dialect.name
+    problems = {}
+    for name, query in hot_queries().items():
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+        if dialect == 'sqlite':
+            plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            full_scan = any(line.startswith('SCAN') and 'USING' not in line for line in plan)
+        elif dialect == 'postgresql':
+            plan = [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+            full_scan = any('Seq Scan' in line for line in plan)
+        elif dialect == 'mysql':
+            rows = connection.execute(text(f"EXPLAIN {sql}")).mappings().all()
+            plan = [f"{row['table']}: type={row['type']} key={row['key']}" for row in rows]
+            full_scan = any(row['type'] == 'ALL' for row in rows)
+        else:
+            continue
+        if full_scan:
+            problems[name] = plan
+    return problems
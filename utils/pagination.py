@@ -0,0 +1,70 @@
+import base64
+import binascii
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+class KeysetPage:
+    """One page of a newest-first listing, addressed by opaque cursors instead of page numbers"""
+
+    def __init__(self, items, has_next, has_prev, total):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+        self.next_cursor = encode_cursor(items[-1]) if items and has_next else None
+        self.prev_cursor = encode_cursor(items[0]) if items and has_prev else None
+
+def encode_cursor(row):
+    raw = f"{row.created_at.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Return (created_at, id) or None for a missing or malformed cursor"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+def keyset_paginate(query, model, cursor=None, direction='next', per_page=20, total=None):
+    """Page through query ordered by (created_at, id) descending.
+
+    direction='next' returns the rows older than the cursor, 'prev' the rows newer
+    than it. Each page costs one indexed range query and no COUNT(*).
+    """
+    position = decode_cursor(cursor)
+    created_at, row_id = model.created_at, model.id
+
+    if position and direction == 'prev':
+        query = query.filter(or_(created_at > position[0],
+                                 and_(created_at == position[0], row_id > position[1])))
+        rows = query.order_by(created_at.asc(), row_id.asc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, has_next=True, has_prev=has_prev, total=total)
+
+    if position:
+        query = query.filter(or_(created_at < position[0],
+                                 and_(created_at == position[0], row_id < position[1])))
+    rows = query.order_by(created_at.desc(), row_id.desc()).limit(per_page + 1).all()
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page,
+                      has_prev=position is not None, total=total)
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def approximate_count(key, query, ttl=60):
+    """COUNT(*) for query, reused for ttl seconds per worker"""
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and now - cached[1] < ttl:
+        return cached[0]
+    count = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[key] = (count, now)
+    return count
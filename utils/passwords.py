@@ -0,0 +1,103 @@
+"""Password hashing off the request thread.
+
+Hashes are computed in a small per-worker process pool so a burst of logins
+can't pin every web worker on CPU. At most PASSWORD_HASH_WORKERS hashes run at
+once and at most PASSWORD_HASH_MAX_QUEUE more may wait; beyond that
+HashingBusy is raised straight away and the route asks the user to try again.
+PASSWORD_HASH_WORKERS = 0 hashes inline, which is handy for the CLI.
+
+PASSWORD_HASH_METHOD is any Werkzeug method string (e.g. "scrypt:32768:8:1",
+"pbkdf2:sha256:600000"). Hashes made with other parameters are upgraded the
+next time their owner logs in, see needs_rehash().
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_TIMEOUT = 10
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued in this worker"""
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def _config(key, default):
+    return current_app.config.get(key, default)
+
+def hash_method():
+    """The configured method with Werkzeug's defaults filled in, as it appears in stored hashes"""
+    method = _config('PASSWORD_HASH_METHOD', None) or 'scrypt'
+    parts = method.split(':')
+    if parts[0] == 'scrypt' and len(parts) == 1:
+        return 'scrypt:32768:8:1'
+    if parts[0] == 'pbkdf2':
+        if len(parts) == 1:
+            parts.append('sha256')
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join(parts)
+
+def _executor():
+    """Return (pool, slots) for this process, creating them after a fork if needed"""
+    global _pool, _pool_pid, _slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool, _slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            workers = _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+            max_queue = _config('PASSWORD_HASH_MAX_QUEUE', DEFAULT_MAX_QUEUE)
+            # fork, so the children don't re-import the app the way spawn would
+            context = multiprocessing.get_context('fork') \
+                if 'fork' in multiprocessing.get_all_start_methods() else None
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _slots = threading.BoundedSemaphore(workers + max_queue)
+            _pool_pid = os.getpid()
+    return _pool, _slots
+
+def _run(function, *args):
+    if not _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS):
+        return function(*args)
+    pool, slots = _executor()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = pool.submit(function, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot stays taken until the hash finishes, even if we stop waiting for it
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_config('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT))
+    except FutureTimeout:
+        raise HashingBusy()
+
+def hash_password(password):
+    """Hash password with the configured method. May raise HashingBusy."""
+    return _run(generate_password_hash, password, hash_method())
+
+def verify_password(password_hash, password):
+    """Check password against password_hash. May raise HashingBusy."""
+    if not password_hash or not password:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """True if password_hash was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != hash_method()
+
+def shutdown():
+    """Stop this process's hashing pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,128 @@
+"""Approval and rejection of deposit and withdrawal requests.
+
+The single-request admin actions and the bulk endpoint both go through
+process_deposits()/process_withdrawals(), which apply a whole batch with a
+handful of set-based statements in one transaction. Balance changes go
+through utils/ledger.py.
+"""
+from datetime import datetime
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+from app import db
+from models import User, DepositRequest, WithdrawalRequest
+from utils import stats, ledger, rollups, leaderboard
+from utils.ledger import LedgerError, Posting, to_minor
+from utils.helpers import get_site_settings
+
+ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+
+def _load_pending(model, ids):
+    """Lock the requested rows; return the pending ones and an error for every other id"""
+    rows = model.query.filter(model.id.in_(ids)).with_for_update().all()
+    found = {row.id: row for row in rows}
+    pending, results = [], {}
+    for request_id in ids:
+        row = found.get(request_id)
+        if row is None:
+            results[request_id] = 'not found'
+        elif row.status != 'pending':
+            results[request_id] = f'already {row.status}'
+        else:
+            pending.append(row)
+    return pending, results
+
+def _approve_deposits(deposits, admin_notes, now):
+    """Credit the deposits; returns the bonuses ({deposit id: minor units}) and (referrer id, commission) paid"""
+    settings = get_site_settings()
+    bonus_rate = settings.deposit_bonus_percentage / 100 \
+        if settings and settings.deposit_bonus_percentage > 0 else 0
+    owners = {user.id: user for user in User.query
+              .options(load_only(User.full_name, User.referred_by))
+              .filter(User.id.in_({deposit.user_id for deposit in deposits}))}
+
+    ledger.claim(DepositRequest, [deposit.id for deposit in deposits], 'approved', now, admin_notes)
+    postings, bonus_amounts, bonuses, commissions = [], [], {}, []
+    for deposit in deposits:
+        owner = owners[deposit.user_id]
+        amount_minor = to_minor(deposit.amount)
+        bonus_minor = to_minor(deposit.amount * bonus_rate)
+        postings.append(Posting(owner.id, 'balance', amount_minor, 'deposit',
+                                f'Deposit approved - {deposit.payment_method}'))
+        if bonus_minor:
+            postings.append(Posting(owner.id, 'bonus_balance', bonus_minor))
+            bonus_amounts.append({'request_id': deposit.id, 'bonus': bonus_minor / 100})
+            bonuses[deposit.id] = bonus_minor
+        if owner.referred_by and settings:
+            commission_minor = to_minor(deposit.amount * (settings.referral_commission_percentage / 100))
+            postings.append(Posting(owner.referred_by, 'referral_commission', commission_minor, 'referral',
+                                    f'Referral commission from {owner.full_name}'))
+            commissions.append((owner.referred_by, commission_minor))
+
+    if bonus_amounts:
+        table = DepositRequest.__table__
+        db.session.execute(table.update().where(table.c.id == bindparam('request_id'))
+                           .values(bonus_amount=bindparam('bonus')), bonus_amounts)
+    ledger.post(postings, now)
+    return {'bonuses': bonuses, 'commissions': commissions}
+
+def _approve_withdrawals(withdrawals, admin_notes, now):
+    ledger.claim(WithdrawalRequest, [withdrawal.id for withdrawal in withdrawals], 'approved', now, admin_notes)
+    ledger.post([Posting(withdrawal.user_id, 'balance', -to_minor(withdrawal.amount), 'withdrawal',
+                         f'Withdrawal approved - {withdrawal.payment_method}')
+                 for withdrawal in withdrawals], now)
+
+def _process(model, ids, action, admin_notes, approve, record):
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown action {action!r}')
+    status = ACTIONS[action]
+    ids = list(dict.fromkeys(int(request_id) for request_id in ids))
+    pending, results = _load_pending(model, ids)
+    now = datetime.utcnow()
+
+    def apply(rows):
+        if status == 'approved':
+            return approve(rows, admin_notes, now) or {}
+        ledger.claim(model, [row.id for row in rows], status, now, admin_notes)
+        return {}
+
+    done, bonuses, commissions = [], {}, []
+    if pending:
+        try:
+            with db.session.begin_nested():
+                paid = apply(pending)
+            done = pending
+            bonuses.update(paid.get('bonuses', {}))
+            commissions += paid.get('commissions', [])
+        except (SQLAlchemyError, LedgerError):
+            # Retry one savepoint per request so a single bad row doesn't sink the batch
+            for row in pending:
+                try:
+                    with db.session.begin_nested():
+                        paid = apply([row])
+                    done.append(row)
+                    bonuses.update(paid.get('bonuses', {}))
+                    commissions += paid.get('commissions', [])
+                except LedgerError as e:
+                    results[row.id] = e.reason
+                except SQLAlchemyError as e:
+                    results[row.id] = f'failed ({e.__class__.__name__})'
+
+    record(done, status)
+    rollups.record_processed(model, done, status, now, bonuses, [amount for _, amount in commissions])
+    done_ids = [row.id for row in done]  # the commit expires the rows
+    db.session.commit()
+    if commissions:
+        leaderboard.record_commissions(referrer_id for referrer_id, _ in commissions)
+    for request_id in done_ids:
+        results[request_id] = status
+    return {request_id: results[request_id] for request_id in ids}
+
+def process_deposits(ids, action, admin_notes=None):
+    """Approve or reject pending deposits. Returns {id: 'approved'/'rejected' or a reason it was skipped}"""
+    return _process(DepositRequest, ids, action, admin_notes, _approve_deposits, stats.record_deposits_processed)
+
+def process_withdrawals(ids, action, admin_notes=None):
+    """Approve or reject pending withdrawals. Returns {id: 'approved'/'rejected' or a reason it was skipped}"""
+    return _process(WithdrawalRequest, ids, action, admin_notes, _approve_withdrawals,
+                    stats.record_withdrawals_processed)
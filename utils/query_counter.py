@@ -0,0 +1,70 @@
+"""Count the SQL statements a block of code (or a whole view) issues.
+
+Used to keep listing pages from regressing into one lazy load per row:
+
+    with assert_max_queries(3):
+        client.get('/admin/deposits')
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, request
+from utils import sql_events
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+@sql_events.subscribe
+def _record_statement(statement, parameters, executemany, seconds):
+    for counter in getattr(_local, 'counters', ()):
+        counter.statements.append(statement)
+
+@contextmanager
+def count_queries():
+    """Collect every statement executed on this thread inside the block"""
+    counter = QueryCounter()
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+@contextmanager
+def assert_max_queries(limit):
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        raise QueryBudgetExceeded(
+            f"{counter.count} queries executed, budget is {limit}:\n" + "\n".join(counter.statements))
+
+def query_budget(limit):
+    """View decorator: fail (ENFORCE_QUERY_BUDGETS, e.g. under test) or log when a view exceeds limit queries"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_app.config.get('ENFORCE_QUERY_BUDGETS'):
+                with assert_max_queries(limit):
+                    return f(*args, **kwargs)
+            with count_queries() as counter:
+                result = f(*args, **kwargs)
+            if counter.count > limit:
+                logger.warning("%s issued %d queries (budget %d)", request.endpoint, counter.count, limit)
+            return result
+        return decorated_function
+    return decorator
@@ -0,0 +1,77 @@
+"""Referral counters and multi-level referral tree queries.
+
+User.referral_count holds how many players a user referred directly; every
+code path that sets referred_by bumps it with an atomic UPDATE in the same
+transaction, and recount() rebuilds it. Deeper levels are answered in SQL
+with a depth-capped recursive CTE over referred_by, so a downline of any
+size is never loaded into Python.
+"""
+from collections import Counter
+from sqlalchemy import bindparam, func, literal, select, update
+from app import db
+from models import User
+
+DEFAULT_MAX_DEPTH = 10
+
+def add_referrals(counts):
+    """Add {referrer id: new referrals} to the counters (in the caller's transaction)"""
+    params = [{'referrer_id': referrer_id, 'delta': delta} for referrer_id, delta in counts.items() if delta]
+    if params:
+        table = User.__table__
+        db.session.execute(update(table).where(table.c.id == bindparam('referrer_id'))
+                           .values(referral_count=table.c.referral_count + bindparam('delta')), params)
+
+def add_referral(referrer_id):
+    add_referrals(Counter([referrer_id]))
+
+def _live_count(table):
+    referred = table.alias('referred')
+    return select(func.count()).where(referred.c.referred_by == table.c.id).scalar_subquery()
+
+def recount(executor):
+    """Recompute every referral_count from referred_by"""
+    table = User.__table__
+    executor.execute(update(table).values(referral_count=_live_count(table)))
+
+def drifted(limit=20):
+    """Users whose stored referral_count is wrong, as (id, stored, live)"""
+    table = User.__table__
+    live = _live_count(table)
+    return db.session.execute(select(table.c.id, table.c.referral_count, live)
+                              .where(table.c.referral_count != live).limit(limit)).all()
+
+def max_depth(requested=None):
+    """The depth to walk: requested, capped at REFERRAL_TREE_MAX_DEPTH"""
+    from flask import current_app
+    cap = current_app.config.get('REFERRAL_TREE_MAX_DEPTH', DEFAULT_MAX_DEPTH)
+    return cap if requested is None else max(1, min(int(requested), cap))
+
+def downline(user_id, depth):
+    """Recursive CTE of (id, depth) for everyone below user_id, at most depth levels down.
+
+    The depth cap also stops the walk on referral cycles.
+    """
+    tree = select(User.id, literal(1).label('depth')).where(User.referred_by == user_id) \
+        .cte('downline', recursive=True)
+    below = select(User.id, tree.c.depth + 1).join(tree, User.referred_by == tree.c.id) \
+        .where(tree.c.depth < depth)
+    return tree.union_all(below)
+
+def downline_levels(user_id, depth):
+    """Size and earnings of each level below user_id: [{'depth', 'users', 'referral_commission_minor', 'balance_minor'}]"""
+    tree = downline(user_id, depth)
+    rows = db.session.execute(
+        select(tree.c.depth, func.count(), func.sum(User.referral_commission_minor), func.sum(User.balance_minor))
+        .join(User, User.id == tree.c.id).group_by(tree.c.depth).order_by(tree.c.depth))
+    return [{'depth': level, 'users': users, 'referral_commission_minor': int(commission or 0),
+             'balance_minor': int(balance or 0)} for level, users, commission, balance in rows]
+
+def upline(user_id, depth):
+    """The chain of referrers above user_id, nearest first, as [(id, full_name, depth)]"""
+    chain = select(User.referred_by.label('id'), literal(1).label('depth')).where(User.id == user_id) \
+        .cte('upline', recursive=True)
+    above = select(User.referred_by, chain.c.depth + 1).join(chain, User.id == chain.c.id) \
+        .where(chain.c.depth < depth, User.referred_by.isnot(None))
+    chain = chain.union_all(above)
+    return db.session.execute(select(User.id, User.full_name, chain.c.depth)
+                              .join(chain, User.id == chain.c.id).order_by(chain.c.depth)).all()
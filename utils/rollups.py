@@ -0,0 +1,143 @@
+"""Daily rollups of processed deposits, withdrawals and referral commissions.
+
+One DailyRollup row per (day, kind, payment_method, status) holds the count
+and amount of the requests processed that day, plus the deposit bonuses they
+paid. payments.py adds to the rows in the same transaction that approves or
+rejects the requests; backfill() rebuilds them from the raw tables (after a
+deploy, or to repair drift). Reports over any range read the rollups only.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import DepositRequest, WithdrawalRequest, Transaction, DailyRollup
+from utils.ledger import to_minor
+
+KINDS = {DepositRequest: 'deposit', WithdrawalRequest: 'withdrawal'}
+COUNTERS = ('count', 'amount_minor', 'bonus_minor')
+
+def _day(value):
+    # func.date() comes back as a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _add(executor, key, deltas):
+    """Add deltas to the row for key, creating it if needed"""
+    table = DailyRollup.__table__
+    day, kind, payment_method, status = key
+    match = (table.c.day == day, table.c.kind == kind, table.c.payment_method == payment_method,
+             table.c.status == status)
+    increment = update(table).where(*match).values({name: table.c[name] + deltas[name] for name in COUNTERS})
+    if executor.execute(increment).rowcount:
+        return
+    try:
+        with executor.begin_nested():
+            executor.execute(insert(table).values(day=day, kind=kind, payment_method=payment_method,
+                                                  status=status, **deltas))
+    except IntegrityError:
+        executor.execute(increment)  # another worker created it first
+
+def record_processed(model, rows, status, now, bonuses=None, referral_commissions=()):
+    """Count requests that just moved to status (in the caller's transaction).
+
+    bonuses ({request id: minor units}) and referral_commissions (minor units)
+    are what the approved deposits paid out.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in rows:
+        entry = totals[(now.date(), KINDS[model], row.payment_method or '', status)]
+        entry['count'] += 1
+        entry['amount_minor'] += to_minor(row.amount)
+        entry['bonus_minor'] += (bonuses or {}).get(row.id, 0)
+    for amount_minor in referral_commissions:
+        entry = totals[(now.date(), 'referral', '', 'approved')]
+        entry['count'] += 1
+        entry['amount_minor'] += amount_minor
+    for key, deltas in totals.items():
+        _add(db.session, key, deltas)
+
+def _day_range(column, since, until):
+    conditions = []
+    if since:
+        conditions.append(column >= datetime.combine(since, datetime.min.time()))
+    if until:
+        conditions.append(column < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+def compute(executor, since=None, until=None):
+    """{(day, kind, payment_method, status): counters} from the raw tables (full scans)"""
+    totals = {}
+    for model, kind in KINDS.items():
+        day = db.func.date(model.processed_at)
+        # Round each row to cents before summing, as record_processed() does
+        amount = db.func.sum(db.func.round(model.amount * 100))
+        bonus = db.func.sum(db.func.round(db.func.coalesce(model.bonus_amount, 0) * 100)) \
+            if model is DepositRequest else db.literal(0)
+        query = select(day, model.payment_method, model.status, db.func.count(), amount, bonus) \
+            .where(model.status.in_(('approved', 'rejected')), model.processed_at.isnot(None),
+                   *_day_range(model.processed_at, since, until)) \
+            .group_by(day, model.payment_method, model.status)
+        for row_day, payment_method, status, count, amount_minor, bonus_minor in executor.execute(query):
+            totals[(_day(row_day), kind, payment_method or '', status)] = {
+                'count': count, 'amount_minor': int(amount_minor or 0), 'bonus_minor': int(bonus_minor or 0)}
+
+    day = db.func.date(Transaction.created_at)
+    query = select(day, db.func.count(), db.func.sum(Transaction.amount_minor)) \
+        .where(Transaction.type == 'referral', *_day_range(Transaction.created_at, since, until)) \
+        .group_by(day)
+    for row_day, count, amount_minor in executor.execute(query):
+        totals[(_day(row_day), 'referral', '', 'approved')] = {
+            'count': count, 'amount_minor': amount_minor or 0, 'bonus_minor': 0}
+    return totals
+
+def backfill(executor, since=None, until=None):
+    """Replace the rollups for since..until (inclusive, default everything) with freshly computed ones"""
+    table = DailyRollup.__table__
+    clear = delete(table)
+    if since:
+        clear = clear.where(table.c.day >= since)
+    if until:
+        clear = clear.where(table.c.day <= until)
+    executor.execute(clear)
+    totals = compute(executor, since, until)
+    if totals:
+        executor.execute(insert(table), [
+            dict(counters, day=day, kind=kind, payment_method=payment_method, status=status)
+            for (day, kind, payment_method, status), counters in totals.items()])
+    return len(totals)
+
+def stored(since=None, until=None):
+    """{(day, kind, payment_method, status): counters} as stored in the rollups"""
+    query = DailyRollup.query
+    if since:
+        query = query.filter(DailyRollup.day >= since)
+    if until:
+        query = query.filter(DailyRollup.day <= until)
+    return {(row.day, row.kind, row.payment_method, row.status): {name: getattr(row, name) for name in COUNTERS}
+            for row in query}
+
+def report(since, until):
+    """Totals for since..until (inclusive) from the rollups: by day and by payment method"""
+    columns = (db.func.sum(DailyRollup.count), db.func.sum(DailyRollup.amount_minor),
+               db.func.sum(DailyRollup.bonus_minor))
+    in_range = (DailyRollup.day >= since, DailyRollup.day <= until)
+
+    days = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(COUNTERS, 0)))
+    for day, kind, status, count, amount_minor, bonus_minor in db.session.execute(
+            select(DailyRollup.day, DailyRollup.kind, DailyRollup.status, *columns)
+            .where(*in_range).group_by(DailyRollup.day, DailyRollup.kind, DailyRollup.status)
+            .order_by(DailyRollup.day.desc())):
+        days[_day(day)][f'{kind}_{status}'] = {'count': count, 'amount_minor': amount_minor,
+                                               'bonus_minor': bonus_minor}
+
+    methods = [{'kind': kind, 'payment_method': payment_method, 'status': status, 'count': count,
+                'amount_minor': amount_minor, 'bonus_minor': bonus_minor}
+               for kind, payment_method, status, count, amount_minor, bonus_minor in db.session.execute(
+                   select(DailyRollup.kind, DailyRollup.payment_method, DailyRollup.status, *columns)
+                   .where(*in_range).group_by(DailyRollup.kind, DailyRollup.payment_method, DailyRollup.status)
+                   .order_by(DailyRollup.kind, DailyRollup.payment_method, DailyRollup.status))]
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for method in methods:
+        for name in COUNTERS:
+            totals[f"{method['kind']}_{method['status']}"][name] += method[name]
+    return {'days': days, 'methods': methods, 'totals': totals}
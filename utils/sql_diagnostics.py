@@ -0,0 +1,160 @@
+"""Slow-query log and N+1 detector, enabled with SQL_DIAGNOSTICS=1.
+
+Every statement is timed through utils/sql_events.py. Statements slower than
+SLOW_QUERY_MS are logged with their parameter shape and the app line that
+issued them. Within a request, the same statement text running
+N_PLUS_ONE_THRESHOLD times or more (one lazy load per row, one lookup per
+candidate) is reported as an N+1 in the X-SQL-Report response header.
+Each worker writes what it saw to instance/sql_diagnostics.<pid>.json when
+it exits; `flask db diagnostics` merges those files. Settings live on the app
+(app.extensions['sql_diagnostics']), so only apps created with SQL_DIAGNOSTICS
+pay for it, even when another app in the same process has it on.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from flask import current_app, request, has_app_context, has_request_context
+from utils import sql_events
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY_PATTERN = 'sql_diagnostics.*.json'
+
+_local = threading.local()
+_summary_lock = threading.Lock()
+# (endpoint, statement) -> {'origin', 'requests', 'max_repeats', 'slow', 'max_ms'}
+_summary = {}
+
+def _shape(statement):
+    return re.sub(r'\s+', ' ', statement).strip()
+
+def _parameter_shape(parameters, executemany):
+    if executemany:
+        first = parameters[0] if parameters else ()
+        return f'{len(parameters)} x {_parameter_shape(first, False)}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters or ()) + ')'
+
+def _origin():
+    """The innermost app frame (not a library, not this module) that led to the statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(ROOT) and filename not in (__file__, sql_events.__file__) \
+                and 'site-packages' not in filename:
+            lineno = frame.f_lineno
+            template = frame.f_globals.get('__jinja_template__')
+            if template is not None:
+                lineno = template.get_corresponding_lineno(lineno)  # compiled template line -> source line
+            return f'{os.path.relpath(filename, ROOT)}:{lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+def _summary_entry(endpoint, statement, origin):
+    return _summary.setdefault((endpoint, statement), {'origin': origin, 'requests': 0, 'max_repeats': 0,
+                                                       'slow': 0, 'max_ms': 0.0})
+
+def _settings():
+    """The current app's settings, or None when it runs without diagnostics"""
+    return current_app.extensions.get('sql_diagnostics') if has_app_context() else None
+
+def _record_statement(statement, parameters, executemany, seconds):
+    settings = _settings()
+    if settings is None:
+        return
+    elapsed_ms = seconds * 1000
+    shape = _shape(statement)
+    seen = getattr(_local, 'statements', None)
+
+    origin = None
+    if seen is not None:
+        entry = seen.get(shape)
+        if entry is None:
+            origin = _origin()
+            seen[shape] = entry = {'count': 0, 'ms': 0.0, 'origin': origin}
+        entry['count'] += 1
+        entry['ms'] += elapsed_ms
+
+    if elapsed_ms >= settings['slow_ms']:
+        origin = origin or _origin()
+        endpoint = request.endpoint if has_request_context() else 'cli'
+        logger.warning('Slow query (%.1f ms) in %s at %s: %s -- params %s', elapsed_ms, endpoint, origin,
+                       shape[:500], _parameter_shape(parameters, executemany))
+        with _summary_lock:
+            summary = _summary_entry(endpoint or 'unmatched', shape, origin)
+            summary['slow'] += 1
+            summary['max_ms'] = max(summary['max_ms'], elapsed_ms)
+
+def _start_request():
+    _local.statements = {}
+
+def _finish_request(response):
+    seen = getattr(_local, 'statements', None)
+    _local.statements = None
+    if seen is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    total_ms = sum(entry['ms'] for entry in seen.values())
+    threshold = _settings()['threshold']
+    repeated = sorted(((shape, entry) for shape, entry in seen.items() if entry['count'] >= threshold),
+                      key=lambda item: -item[1]['count'])
+
+    report = [f"queries={sum(entry['count'] for entry in seen.values())}", f'time={total_ms:.1f}ms']
+    report += [f"n+1={entry['origin']} x{entry['count']}" for _, entry in repeated]
+    response.headers['X-SQL-Report'] = '; '.join(report)
+
+    if repeated:
+        logger.warning('N+1 in %s: %s', endpoint,
+                       '; '.join(f"{entry['origin']} ran {entry['count']}x: {shape[:200]}" for shape, entry in repeated))
+        with _summary_lock:
+            for shape, entry in repeated:
+                summary = _summary_entry(endpoint, shape, entry['origin'])
+                summary['requests'] += 1
+                summary['max_repeats'] = max(summary['max_repeats'], entry['count'])
+    return response
+
+def write_summary(directory):
+    """Write this worker's findings to <directory>/sql_diagnostics.<pid>.json"""
+    with _summary_lock:
+        findings = [dict(value, endpoint=endpoint, statement=statement)
+                    for (endpoint, statement), value in _summary.items()]
+    if not findings:
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'sql_diagnostics.{os.getpid()}.json'), 'w') as f:
+        json.dump(findings, f, indent=2)
+
+def merged_summary(directory):
+    """Findings from every worker's summary file, worst first"""
+    merged = {}
+    for path in glob.glob(os.path.join(directory, SUMMARY_PATTERN)):
+        with open(path) as f:
+            for finding in json.load(f):
+                key = (finding['endpoint'], finding['statement'])
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = finding
+                    continue
+                existing['requests'] += finding['requests']
+                existing['slow'] += finding['slow']
+                existing['max_repeats'] = max(existing['max_repeats'], finding['max_repeats'])
+                existing['max_ms'] = max(existing['max_ms'], finding['max_ms'])
+    return sorted(merged.values(), key=lambda finding: (-finding['requests'], -finding['slow']))
+
+def init_app(app):
+    """Turn diagnostics on for app when SQL_DIAGNOSTICS is set"""
+    if not app.config.get('SQL_DIAGNOSTICS'):
+        return
+    app.extensions['sql_diagnostics'] = {'slow_ms': app.config.get('SLOW_QUERY_MS', 100.0),
+                                         'threshold': app.config.get('N_PLUS_ONE_THRESHOLD', 5)}
+    sql_events.subscribe(_record_statement)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    atexit.register(write_summary, app.instance_path)
@@ -0,0 +1,50 @@
+"""One pair of engine cursor listeners shared by everything that watches SQL.
+
+Query budgets (utils/query_counter.py), request metrics (utils/metrics.py) and
+the slow-query / N+1 diagnostics (utils/sql_diagnostics.py) all subscribe
+here instead of each adding their own before/after_cursor_execute listeners,
+so a statement is timed once and pays for one conn.info stack:
+
+    @sql_events.subscribe
+    def _on_statement(statement, parameters, executemany, seconds):
+        ...
+
+Subscribers run after the statement, in subscription order, on the thread
+that executed it. Statements that raise are not reported.
+"""
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_subscribers = []
+
+def subscribe(callback):
+    """Call callback(statement, parameters, executemany, seconds) after every statement; returns callback"""
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    return callback
+
+def unsubscribe(callback):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _subscribers:
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('statement_started')
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    for callback in _subscribers:
+        callback(statement, parameters, executemany, seconds)
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # after_cursor_execute won't run; drop the start time so the next statement isn't timed from it
+    started = context.connection.info.get('statement_started') if context.connection is not None else None
+    if started:
+        started.pop()
@@ -0,0 +1,112 @@
+from datetime import datetime
+from sqlalchemy import case
+from app import db
+from models import User, Game, DepositRequest, WithdrawalRequest, PlatformStats, from_minor
+from utils.ledger import to_minor
+
+STATS_ID = 1
+
+COUNTER_FIELDS = ('total_users', 'total_games', 'total_deposits', 'total_withdrawals',
+                  'today_deposits', 'today_withdrawals', 'pending_deposits', 'pending_withdrawals')
+# Stored as integer minor units in <name>_minor and reported as Decimal
+MONEY_FIELDS = ('total_deposits', 'total_withdrawals', 'today_deposits', 'today_withdrawals')
+
+def _approved_minor(model, *criteria):
+    # Rounded per row, like to_minor() when the row is recorded
+    total = db.session.query(db.func.sum(db.func.round(model.amount * 100))) \
+        .filter(model.status == 'approved', *criteria).scalar()
+    return int(total or 0)
+
+def compute_platform_stats():
+    """Compute the dashboard counters from the live tables (slow, full scans)"""
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return {
+        'total_users': User.query.count(),
+        'total_games': Game.query.count(),
+        'total_deposits': from_minor(_approved_minor(DepositRequest)),
+        'total_withdrawals': from_minor(_approved_minor(WithdrawalRequest)),
+        'today_deposits': from_minor(_approved_minor(DepositRequest, DepositRequest.created_at >= today)),
+        'today_withdrawals': from_minor(_approved_minor(WithdrawalRequest, WithdrawalRequest.created_at >= today)),
+        'pending_deposits': DepositRequest.query.filter_by(status='pending').count(),
+        'pending_withdrawals': WithdrawalRequest.query.filter_by(status='pending').count(),
+    }
+
+def rebuild_platform_stats():
+    """Recompute the summary row from scratch and store it (caller commits)"""
+    values = compute_platform_stats()
+    stats = db.session.get(PlatformStats, STATS_ID)
+    if not stats:
+        stats = PlatformStats(id=STATS_ID)
+        db.session.add(stats)
+    for name, value in values.items():
+        if name in MONEY_FIELDS:
+            setattr(stats, f'{name}_minor', to_minor(value))
+        else:
+            setattr(stats, name, value)
+    stats.stats_date = datetime.utcnow().date()
+    stats.updated_at = datetime.utcnow()
+    db.session.flush()
+    return values
+
+def get_platform_stats():
+    """Read the dashboard counters from the summary row, seeding it on first use"""
+    stats = db.session.get(PlatformStats, STATS_ID)
+    if not stats:
+        values = rebuild_platform_stats()
+        db.session.commit()
+        return values
+    values = {name: getattr(stats, name) for name in COUNTER_FIELDS}
+    if stats.stats_date != datetime.utcnow().date():
+        # Nothing has been recorded since midnight yet
+        values['today_deposits'] = from_minor(0)
+        values['today_withdrawals'] = from_minor(0)
+    return values
+
+def _apply(today_deposits_minor=0, today_withdrawals_minor=0, **deltas):
+    """Apply counter deltas (money in minor units) with a single UPDATE in the caller's transaction"""
+    table = PlatformStats.__table__
+    today = datetime.utcnow().date()
+    same_day = table.c.stats_date == today
+    values = {name: table.c[name] + delta for name, delta in deltas.items() if delta}
+    values['today_deposits_minor'] = case((same_day, table.c.today_deposits_minor + today_deposits_minor),
+                                          else_=today_deposits_minor)
+    values['today_withdrawals_minor'] = case((same_day, table.c.today_withdrawals_minor + today_withdrawals_minor),
+                                             else_=today_withdrawals_minor)
+    values['stats_date'] = today
+    values['updated_at'] = datetime.utcnow()
+    result = db.session.execute(table.update().where(table.c.id == STATS_ID).values(**values))
+    if result.rowcount == 0:
+        # No summary yet: the rebuild autoflushes, so it already includes this change
+        rebuild_platform_stats()
+
+def _created_today(request_row):
+    return request_row.created_at is not None and request_row.created_at.date() == datetime.utcnow().date()
+
+def record_user_registered(count=1):
+    _apply(total_users=count)
+
+def record_game_added(count=1):
+    _apply(total_games=count)
+
+def record_deposit_submitted():
+    _apply(pending_deposits=1)
+
+def record_withdrawal_submitted():
+    _apply(pending_withdrawals=1)
+
+def _processing_deltas(kind, rows, new_status):
+    """Counter deltas for pending rows of one kind ('deposits'/'withdrawals') moving to new_status"""
+    deltas = {f'pending_{kind}': -len(rows)}
+    if new_status == 'approved':
+        deltas[f'total_{kind}_minor'] = sum(to_minor(row.amount) for row in rows)
+        deltas[f'today_{kind}_minor'] = sum(to_minor(row.amount) for row in rows if _created_today(row))
+    return deltas
+
+def record_deposits_processed(deposits, new_status):
+    """Account for pending deposits being approved or rejected, one UPDATE for the whole batch"""
+    if deposits:
+        _apply(**_processing_deltas('deposits', deposits, new_status))
+
+def record_withdrawals_processed(withdrawals, new_status):
+    if withdrawals:
+        _apply(**_processing_deltas('withdrawals', withdrawals, new_status))
@@ -0,0 +1,109 @@
+"""Content-addressed storage for uploads.
+
+Files are streamed to a temporary file in chunks while being hashed, then moved
+to <sha256[:2]>/<sha256><ext> under UPLOAD_FOLDER. Uploading the same content
+again reuses the stored blob. Deposit screenshots get a deposit_ prefix so
+routes/uploads.py keeps them admin-only. Blobs that no DepositRequest, Game or
+HomepageSlider row points at are removed by `flask storage gc`.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from flask import current_app
+from sqlalchemy import select, union
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+from app import db
+from models import StoredFile, DepositRequest, Game, HomepageSlider
+
+CHUNK_SIZE = 64 * 1024
+TEMP_DIR = '.incoming'
+PRIVATE_KINDS = {'deposit': 'deposit_'}
+
+def upload_root():
+    return os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+
+def save_upload(file, kind):
+    """Store a werkzeug FileStorage and return its path relative to UPLOAD_FOLDER.
+
+    The StoredFile row is added to the session; the caller commits it together
+    with the row that references the path.
+    """
+    root = upload_root()
+    temp_dir = os.path.join(root, TEMP_DIR)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    digest, size = hashlib.sha256(), 0
+    with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+        try:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                temp.write(chunk)
+        except BaseException:
+            temp.close()
+            os.unlink(temp.name)
+            raise
+
+    sha256 = digest.hexdigest()
+    extension = os.path.splitext(secure_filename(file.filename or ''))[1].lower()
+    path = f"{sha256[:2]}/{PRIVATE_KINDS.get(kind, '')}{sha256}{extension}"
+    target = os.path.join(root, path)
+    if os.path.exists(target):
+        os.unlink(temp.name)  # already stored
+        os.utime(target)  # restart the gc grace period until the new reference is committed
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(temp.name, 0o644)
+        os.replace(temp.name, target)
+
+    if not db.session.execute(select(StoredFile.id).filter_by(path=path)).first():
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredFile(path=path, sha256=sha256, size=size,
+                                          content_type=file.mimetype or mimetypes.guess_type(path)[0]))
+        except IntegrityError:
+            pass  # stored concurrently by another request
+    return path
+
+def referenced_paths():
+    """Every upload path a DepositRequest, Game or HomepageSlider row points at"""
+    query = union(select(DepositRequest.screenshot.label('path')),
+                  select(Game.thumbnail), select(Game.game_file),
+                  select(HomepageSlider.image_path))
+    return {path for path in db.session.execute(query).scalars() if path}
+
+def collect_garbage(grace_seconds=24 * 3600, dry_run=False):
+    """Delete unreferenced files older than grace_seconds. Returns (removed paths, bytes freed).
+
+    The grace period covers uploads whose referencing row is not committed yet.
+    """
+    root = upload_root()
+    referenced = referenced_paths()
+    cutoff = time.time() - grace_seconds
+    removed, freed = [], 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(directory, filename)
+            path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            if path in referenced:
+                continue
+            stat = os.stat(full_path)
+            if stat.st_mtime > cutoff:
+                continue
+            removed.append(path)
+            freed += stat.st_size
+            if not dry_run:
+                os.unlink(full_path)
+
+    if removed and not dry_run:
+        for start in range(0, len(removed), 500):
+            StoredFile.query.filter(StoredFile.path.in_(removed[start:start + 500]))\
+                .delete(synchronize_session=False)
+        db.session.commit()
+    return removed, freed
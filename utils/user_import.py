@@ -0,0 +1,163 @@
+"""Bulk import of players from a partner brand's CSV export.
+
+Expected columns: full_name, phone, password (or password_hash), and optionally
+username, referral_code (the player's code at the partner brand) and
+referred_by (the referrer's code). Rows are streamed and inserted in chunks
+with executemany; referrers are resolved in a second pass once every row is in.
+"""
+import secrets
+import string
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import bindparam, insert, select
+from werkzeug.security import generate_password_hash
+from app import db
+from models import User
+from utils import stats, passwords, referrals
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+REQUIRED_COLUMNS = ('full_name', 'phone')
+REFERRAL_CODE_LENGTH = User.__table__.c.referral_code.type.length
+
+def check_columns(fieldnames):
+    """Raise ValueError naming the required columns a CSV header lacks"""
+    missing = [name for name in REQUIRED_COLUMNS if name not in fieldnames]
+    if 'password' not in fieldnames and 'password_hash' not in fieldnames:
+        missing.append('password (or password_hash)')
+    if missing:
+        raise ValueError(f"missing required column(s): {', '.join(missing)}")
+
+def _existing(column, values):
+    if not values:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+def generate_referral_codes(count, reserved=()):
+    """Return count new unique referral codes, checking the database once per round of candidates"""
+    codes = set()
+    reserved = set(reserved)
+    while len(codes) < count:
+        candidates = {''.join(secrets.choice(CODE_ALPHABET) for _ in range(8))
+                      for _ in range(count - len(codes))} - reserved - codes
+        codes |= candidates - _existing(User.referral_code, candidates)
+    return list(codes)
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _hash_passwords(pool, passwords, method):
+    return pool.map(_hash_with_method, [(password, method) for password in passwords], chunksize=16)
+
+def _hash_with_method(args):
+    password, method = args
+    return generate_password_hash(password, method=method)
+
+def import_users(rows, chunk_size=1000, workers=None, hash_method=None, progress=None):
+    """Insert users from an iterable of dicts. Returns a report dict.
+
+    Passwords are hashed in a process pool of `workers` processes. Rows whose
+    phone or username already exists, or repeats an earlier row's, are skipped
+    and listed in the report. A csv.DictReader's header is checked before any
+    work starts; ValueError is raised if required columns are missing.
+    """
+    fieldnames = getattr(rows, 'fieldnames', None)  # reads the header of a csv.DictReader
+    if fieldnames is not None:
+        check_columns(fieldnames)
+    report = {'inserted': 0, 'skipped': [], 'referrals': 0, 'unresolved_referrals': 0}
+    code_map = {}  # partner referral code -> our referral code
+    pending_referrals = []  # (phone, partner code of the referrer)
+    started = datetime.utcnow()
+
+    hash_method = hash_method or passwords.hash_method()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(rows, chunk_size):
+            phones = {row['phone'] for row in chunk}
+            usernames = {row['username'] for row in chunk if row.get('username')}
+            taken_phones = _existing(User.phone, phones)
+            taken_usernames = _existing(User.username, usernames)
+            wanted_codes = {row['referral_code'] for row in chunk if row.get('referral_code')}
+            taken_codes = _existing(User.referral_code, wanted_codes) | set(code_map.values())
+
+            accepted, seen_phones, seen_usernames = [], set(), set()
+            for row in chunk:
+                username = row.get('username')
+                if row['phone'] in taken_phones or row['phone'] in seen_phones:
+                    report['skipped'].append((row['phone'], 'phone already registered'))
+                elif username and (username in taken_usernames or username in seen_usernames):
+                    report['skipped'].append((row['phone'], 'username already taken'))
+                elif not row.get('password') and not row.get('password_hash'):
+                    report['skipped'].append((row['phone'], 'no password'))
+                else:
+                    seen_phones.add(row['phone'])
+                    if username:
+                        seen_usernames.add(username)
+                    accepted.append(row)
+
+            # Keep the partner's code when it fits and is free here, otherwise issue a new one
+            codes = []
+            for row in accepted:
+                code = row.get('referral_code')
+                if code and len(code) <= REFERRAL_CODE_LENGTH and code not in taken_codes:
+                    taken_codes.add(code)
+                    codes.append(code)
+                else:
+                    codes.append(None)
+            fresh_codes = iter(generate_referral_codes(codes.count(None), reserved=taken_codes))
+            codes = [code or next(fresh_codes) for code in codes]
+
+            plain = [row for row in accepted if not row.get('password_hash')]
+            hashes = dict(zip(map(id, plain), _hash_passwords(pool, [row['password'] for row in plain], hash_method)))
+
+            now = datetime.utcnow()
+            inserts = []
+            for row, code in zip(accepted, codes):
+                if row.get('referral_code'):
+                    code_map.setdefault(row['referral_code'], code)
+                if row.get('referred_by'):
+                    pending_referrals.append((row['phone'], row['referred_by']))
+                inserts.append({
+                    'full_name': row['full_name'],
+                    'phone': row['phone'],
+                    'username': row.get('username') or None,
+                    'password_hash': row.get('password_hash') or hashes[id(row)],
+                    'referral_code': code,
+                    'created_at': now,
+                })
+
+            if inserts:
+                db.session.execute(insert(User), inserts)
+                stats.record_user_registered(len(inserts))
+                db.session.commit()
+            report['inserted'] += len(inserts)
+            if progress:
+                progress(report['inserted'], (datetime.utcnow() - started).total_seconds())
+
+    # Second pass: referrers may appear later in the file than the players they referred
+    table = User.__table__
+    for chunk in _chunks(pending_referrals, chunk_size):
+        codes = {code_map.get(code, code) for _, code in chunk}
+        referrer_ids = dict(db.session.execute(select(table.c.referral_code, table.c.id)
+                                               .where(table.c.referral_code.in_(codes))).all())
+        updates = []
+        for phone, code in chunk:
+            referrer_id = referrer_ids.get(code_map.get(code, code))
+            if referrer_id:
+                updates.append({'player_phone': phone, 'referrer_id': referrer_id})
+            else:
+                report['unresolved_referrals'] += 1
+        if updates:
+            db.session.execute(table.update().where(table.c.phone == bindparam('player_phone'))
+                               .values(referred_by=bindparam('referrer_id')), updates)
+            referrals.add_referrals(Counter(update['referrer_id'] for update in updates))
+            db.session.commit()
+        report['referrals'] += len(updates)
+
+    report['seconds'] = (datetime.utcnow() - started).total_seconds()
+    return report